@@ -4,6 +4,7 @@ Multi-tenant FastAPI server for Reddit Lead Finder
 """
 
 from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -16,6 +17,7 @@ import logging
 from dotenv import load_dotenv
 
 from database import Database
+from database_async import AsyncDatabase
 from deepseek_analyzer import DeepSeekAnalyzer
 from supabase_auth import SupabaseAuth
 
@@ -59,6 +61,7 @@ app.add_middleware(
 
 # Initialize services
 db = Database()
+async_db = AsyncDatabase()
 ai_analyzer = DeepSeekAnalyzer()
 supabase_auth = SupabaseAuth()
 
@@ -153,6 +156,19 @@ def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Depends(securit
         logger.error(f"❌ Token verification error: {e}")
         raise HTTPException(status_code=401, detail="Token verification failed")
 
+@app.on_event("startup")
+async def startup():
+    try:
+        await async_db.init()
+        logger.info("✅ Async database pool ready")
+    except Exception as e:
+        # Read endpoints fall back to the sync Database when the pool is unavailable
+        logger.warning(f"⚠️ Async database pool unavailable, using sync reads: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await async_db.close()
+
 # Routes
 @app.get("/")
 async def root():
@@ -248,7 +264,8 @@ async def get_scraper_status(user_id: int = Depends(verify_jwt_token)):
 # Authentication endpoints
 @app.post("/api/auth/register")
 async def register(user: UserRegister):
-    user_id = db.create_user(user.email, user.password)
+    # bcrypt is deliberately slow; keep it off the event loop
+    user_id = await run_in_threadpool(db.create_user, user.email, user.password)
     if user_id is None:
         raise HTTPException(status_code=400, detail="Email already exists")
     
@@ -257,17 +274,17 @@ async def register(user: UserRegister):
 
 @app.post("/api/auth/login")
 async def login(user: UserLogin):
-    user_id = db.verify_user(user.email, user.password)
+    user_id = await run_in_threadpool(db.verify_user, user.email, user.password)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_jwt_token(user_id)
-    user_data = db.get_user(user_id)
+    user_data = await run_in_threadpool(db.get_user, user_id)
     return {"token": token, "user": user_data}
 
 @app.get("/api/auth/me")
 async def get_current_user(user_id: int = Depends(verify_jwt_token)):
-    user = db.get_user(user_id)
+    user = await run_in_threadpool(db.get_user, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return {"user": user}
@@ -361,7 +378,7 @@ async def analyze_website(business_id: str, data: WebsiteAnalyze, user_id: int =
     
     try:
         # Analyze website for keywords
-        keywords = ai_analyzer.analyze_website_for_keywords(data.website_url, business['name'])
+        keywords = await run_in_threadpool(ai_analyzer.analyze_website_for_keywords, data.website_url, business['name'])
         
         return {
             "keywords": keywords
@@ -384,8 +401,10 @@ async def ai_auto_setup(business_id: str, data: dict, user_id: int = Depends(ver
             if not website_url:
                 raise HTTPException(status_code=400, detail="Website URL is required for website mode")
             
-            # Perform comprehensive AI analysis with website
-            setup_data = ai_analyzer.comprehensive_business_setup(
+            # Perform comprehensive AI analysis with website (off the event loop; the
+            # DeepSeek call can take tens of seconds)
+            setup_data = await run_in_threadpool(
+                ai_analyzer.comprehensive_business_setup,
                 website_url=website_url,
                 business_name=business_name
             )
@@ -409,7 +428,8 @@ async def ai_auto_setup(business_id: str, data: dict, user_id: int = Depends(ver
                 raise HTTPException(status_code=400, detail="Business prompt is required for text mode")
             
             # Perform AI analysis with text prompt only
-            setup_data = ai_analyzer.text_based_business_setup(
+            setup_data = await run_in_threadpool(
+                ai_analyzer.text_based_business_setup,
                 business_prompt=business_prompt,
                 business_name=business_name
             )
@@ -437,12 +457,11 @@ async def ai_auto_setup(business_id: str, data: dict, user_id: int = Depends(ver
             
             # Add new keywords (limit to 10)
             keywords_to_add = setup_data['keywords'][:10]  # Limit to 10
-            for keyword_data in keywords_to_add:
-                db.add_business_keyword(
-                    business['id'], 
-                    keyword_data['keyword'], 
-                    'ai_auto_setup'
-                )
+            db.add_business_keywords(
+                business['id'],
+                [keyword_data['keyword'] for keyword_data in keywords_to_add],
+                'ai_auto_setup'
+            )
         
         # Debug logging
         logger.info(f"🔍 AI Setup Data: {setup_data}")
@@ -691,7 +710,10 @@ async def get_business_leads(business_id: str, limit: int = 50, user_id: int = D
     # Verify business ownership
     business = get_business_by_public_id_or_404(business_id, user_id)
     
-    leads = db.get_business_leads(business['id'], limit)
+    if async_db.pool is not None:
+        leads = await async_db.get_business_leads(business['id'], limit)
+    else:
+        leads = db.get_business_leads(business['id'], limit)
     return {"leads": leads, "total": len(leads)}
 
 if __name__ == "__main__":
@@ -25,6 +25,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import Database
 from f5bot_reddit_scraper import search_reddit_leads_efficient
+from keyword_matcher import KeywordMatcher
 from deepseek_analyzer import DeepSeekAnalyzer
 
 # Set up logging
@@ -118,36 +119,35 @@ class LeadScrapingService:
                 logger.info("ℹ️  No new leads found")
                 return 0
             
-            # Store leads in database
-            stored_count = 0
-            duplicate_count = 0
-            
+            # Store leads in database with a single batched insert
+            rows = []
             for lead in leads:
-                try:
-                    # Extract Reddit post ID from URL for platform_id
-                    platform_id = lead.get('id', '').replace('f5bot_', '') or f"unknown_{hash(lead.get('title', ''))}"
-                    
-                    lead_id = self.db.add_global_lead(
-                        platform='reddit',
-                        platform_id=platform_id,
-                        title=lead.get('title', ''),
-                        content=lead.get('content', ''),
-                        author=lead.get('author', ''),
-                        url=lead.get('url', ''),
-
-                        score=lead.get('upvotes', 0)
-                    )
-                    
-                    if lead_id:
-                        stored_count += 1
-                        matched_kw = ', '.join(lead.get('matched_keywords', [])[:2])
-                        logger.info(f"  ✅ Stored: {lead['title'][:40]}... | Keywords: {matched_kw}")
-                    else:
-                        duplicate_count += 1
-                        
-                except Exception as e:
-                    logger.error(f"  ❌ Error storing lead: {str(e)}")
-                    continue
+                # Extract Reddit post ID from URL for platform_id
+                platform_id = lead.get('id', '').replace('f5bot_', '') or f"unknown_{hash(lead.get('title', ''))}"
+                rows.append((
+                    'reddit',
+                    platform_id,
+                    lead.get('title', ''),
+                    lead.get('content', ''),
+                    lead.get('author', ''),
+                    lead.get('url', ''),
+                    lead.get('upvotes', 0)
+                ))
+            
+            try:
+                stored = self.db.add_global_leads(rows)
+            except Exception as e:
+                logger.error(f"  ❌ Error storing leads: {str(e)}")
+                return 0
+            
+            stored_count = len(stored)
+            duplicate_count = len(rows) - stored_count
+            
+            for lead, row in zip(leads, rows):
+                # pop so a post repeated within the batch is only reported once
+                if stored.pop((row[0], row[1]), None):
+                    matched_kw = ', '.join(lead.get('matched_keywords', [])[:2])
+                    logger.info(f"  ✅ Stored: {lead['title'][:40]}... | Keywords: {matched_kw}")
             
             logger.info(f"📊 F5Bot results: {stored_count} stored, {duplicate_count} duplicates")
             return stored_count
@@ -234,62 +234,47 @@ class LeadScrapingService:
                     continue
                 
                 keyword_list = [kw['keyword'].lower() for kw in keywords]
+                matcher = KeywordMatcher(keyword_list)
                 logger.info(f"    🔍 Keywords: {', '.join(keyword_list[:3])}{'...' if len(keyword_list) > 3 else ''}")
                 
                 # Get unprocessed leads for this business
                 unprocessed_leads = self.db.get_unprocessed_leads_for_business(business_id)
-                logger.info(f"    📊 {len(unprocessed_leads)} unprocessed leads")
                 
-                # Filter leads that match business keywords first
+                # Filter leads that match business keywords first, streaming rows as they arrive
                 matching_leads = []
+                processed_count = 0
                 for lead in unprocessed_leads:
-                    lead_text = f"{lead['title']} {lead['content']}".lower()
-                    matched_keywords = []
-                    
-                    for keyword in keyword_list:
-                        if keyword.lower() in lead_text:
-                            matched_keywords.append(keyword)
+                    processed_count += 1
+                    matched_keywords = matcher.match(f"{lead['title']} {lead['content']}")
                     
                     if matched_keywords:
                         lead['matched_keywords'] = matched_keywords
                         matching_leads.append(lead)
                 
+                logger.info(f"    📊 {processed_count} unprocessed leads")
                 logger.info(f"    🎯 {len(matching_leads)} leads match business keywords")
                 
-                processed_count = len(unprocessed_leads)
                 matched_count = 0
                 
-                # Process leads in batches of 5 for AI analysis (smaller batches to avoid timeouts)
-                batch_size = 5
-                for i in range(0, len(matching_leads), batch_size):
-                    batch = matching_leads[i:i + batch_size]
-                    
+                # Analyze leads in batches of 5 (smaller batches avoid timeouts), several batches in parallel.
+                # AI_ANALYSIS_BATCH_SIZE=1 gives every lead its own full analysis instead.
+                batch_size = max(1, int(os.getenv('AI_ANALYSIS_BATCH_SIZE', '5')))
+                if matching_leads:
+                    logger.info(f"    🤖 Analyzing {len(matching_leads)} leads in {(len(matching_leads) + batch_size - 1) // batch_size} batches")
+                
+                analyzed_batches = self.ai.analyze_lead_batches_for_business(
+                    leads=matching_leads,
+                    business_keywords=keyword_list,
+                    business_name=business_name,
+                    business_description=business_description or "No description available",
+                    buying_intent=buying_intent or "",
+                    batch_size=batch_size
+                )
+                
+                for batch_num, analyzed_leads in analyzed_batches:
                     try:
-                        batch_num = i//batch_size + 1
-                        logger.info(f"    🤖 Analyzing batch {batch_num} ({len(batch)} leads)")
-                        
-                        # Batch analyze with AI (with retry on timeout)
-                        analyzed_leads = None
-                        for retry in range(2):  # Try twice
-                            try:
-                                analyzed_leads = self.ai.batch_analyze_leads_for_business(
-                                    leads=batch,
-                                    business_keywords=keyword_list,
-                                    business_name=business_name,
-                                    business_description=business_description or "No description available",
-                                    buying_intent=buying_intent or ""
-                                )
-                                break  # Success, exit retry loop
-                            except Exception as e:
-                                if "timeout" in str(e).lower() and retry == 0:
-                                    logger.warning(f"    ⚠️  Batch {batch_num} timed out, retrying...")
-                                    time.sleep(2)
-                                    continue
-                                else:
-                                    raise e
-                        
                         if not analyzed_leads:
-                            logger.error(f"    ❌ Batch {batch_num} failed after retries")
+                            logger.error(f"    ❌ Batch {batch_num} failed")
                             continue
                         
                         # Save leads that meet the threshold
@@ -312,11 +297,8 @@ class LeadScrapingService:
                                     matched_count += 1
                                     logger.info(f"    ✅ Matched: {analyzed_lead['title'][:40]}... (Score: {ai_score}%)")
                         
-                        # Small delay between batches
-                        time.sleep(1)
-                        
                     except Exception as e:
-                        logger.error(f"    ❌ Error processing batch: {str(e)}")
+                        logger.error(f"    ❌ Error processing batch {batch_num}: {str(e)}")
                         continue
                 
                 logger.info(f"    📊 Results: {processed_count} processed, {matched_count} matched")
@@ -341,6 +323,8 @@ class LeadScrapingService:
         logger.info(f"   Leads processed: {processed_results.get('total_processed', 0)}")
         logger.info(f"   Leads matched: {processed_results.get('total_matched', 0)}")
         logger.info(f"   Businesses processed: {processed_results.get('businesses_processed', 0)}")
+        lead_cache = self.ai.cache_stats()['leads']
+        logger.info(f"   AI lead cache: {lead_cache['hits']} hits / {lead_cache['misses']} misses ({lead_cache['hit_rate']:.0%})")
         logger.info(f"   Next run in: {interval_minutes} minutes")
         
         if 'error' in processed_results:
@@ -1,14 +1,165 @@
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+import atexit
+import base64
+import contextlib
+import functools
 import hashlib
-from datetime import datetime
-import json
+from datetime import datetime, timezone
 import bcrypt
 import os
+import threading
+import time
+from cryptography.fernet import Fernet, InvalidToken
 from dotenv import load_dotenv
 
+from cache import SingleFlight, TTLCache
+
 load_dotenv()
 
+# Pass dicts straight through as JSON parameters (notification data etc.)
+psycopg2.extensions.register_adapter(dict, psycopg2.extras.Json)
+
+# Social account passwords are encrypted with Fernet when SOCIAL_ACCOUNT_KEY is set.
+# Rows written before the key existed are plain base64 and still readable.
+_social_account_key = os.getenv('SOCIAL_ACCOUNT_KEY')
+try:
+    _fernet = Fernet(_social_account_key.encode()) if _social_account_key else None
+except ValueError as e:
+    raise RuntimeError(
+        "SOCIAL_ACCOUNT_KEY is not a valid Fernet key (32 url-safe base64-encoded bytes). Generate one with: "
+        "python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\""
+    ) from e
+
+def _encrypt_social_password(password):
+    if _fernet:
+        return _fernet.encrypt(password.encode()).decode()
+    return base64.b64encode(password.encode()).decode()
+
+# Every Fernet token starts with this (version byte 0x80 + timestamp high bytes);
+# base64 of a UTF-8 password never can, since 0x80 is not a valid leading byte
+_FERNET_TOKEN_PREFIX = 'gAAAA'
+
+@functools.lru_cache(maxsize=1024)
+def _decrypt_social_password(password_encrypted):
+    # Keyed on the ciphertext, so re-encrypting under a new key misses the cache
+    if not password_encrypted.startswith(_FERNET_TOKEN_PREFIX):
+        return base64.b64decode(password_encrypted).decode()
+    
+    if not _fernet:
+        raise RuntimeError("Social account password is encrypted but SOCIAL_ACCOUNT_KEY is not set")
+    try:
+        return _fernet.decrypt(password_encrypted.encode()).decode()
+    except InvalidToken as e:
+        raise RuntimeError(
+            "Social account password could not be decrypted: SOCIAL_ACCOUNT_KEY does not match "
+            "the key it was encrypted with"
+        ) from e
+
+# Process-wide caches for rows that change rarely but are read on every
+# reply generation / notification. Writes in this process invalidate
+# immediately; other workers see changes once the TTL expires.
+_ai_settings_cache = TTLCache(maxsize=4096, ttl=300)
+# user_id -> bitmask of notification types with email turned off
+_email_mask_cache = TTLCache(maxsize=4096, ttl=300)
+# bcrypt work factor for new password hashes; lower it (min 4) only for test environments
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+# Successful bcrypt checks, keyed on (email, sha256(password)) -> user_id
+_auth_cache = TTLCache(maxsize=4096, ttl=300)
+# Concurrent identical reads (same key) share one query
+_singleflight = SingleFlight()
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which server-side prepared statements it holds"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+# Hot statements that are worth parsing and planning once per connection
+PREPARED_STATEMENTS = {
+    'get_reply_by_id_v1': '''
+        SELECT r.*, bl.business_id, gl.title as lead_title, gl.url as lead_url, 
+               gl.platform as lead_platform, 
+               gl.author as lead_author, bl.ai_score
+        FROM replies r
+        JOIN business_leads bl ON r.business_lead_id = bl.id
+        JOIN businesses b ON bl.business_id = b.id
+        JOIN global_leads gl ON bl.global_lead_id = gl.id
+        WHERE r.id = $1 AND b.user_id = $2
+    ''',
+    'add_global_lead_v1': '''
+        INSERT INTO global_leads (platform, platform_id, title, content, author, url, score) 
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        ON CONFLICT (platform, platform_id) DO NOTHING
+        RETURNING id
+    ''',
+    'add_business_lead_v2': '''
+        INSERT INTO business_leads (business_id, global_lead_id, ai_score, ai_reasoning, matched_keywords) 
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (business_id, global_lead_id) DO NOTHING
+        RETURNING id
+    ''',
+    'get_business_keywords_v1': '''
+        SELECT id, keyword, source, created_at 
+        FROM keywords WHERE business_id = $1
+    ''',
+}
+
+# Bit assigned to each notification type in the per-user email-disabled mask.
+# Append new types at the end so existing bit positions stay stable.
+NOTIFICATION_TYPES = ('new_lead', 'reply_posted', 'ai_suggestion_ready', 'account_verification', 'scraper_status')
+EMAIL_NOTIFICATION_BITS = {notification_type: 1 << i for i, notification_type in enumerate(NOTIFICATION_TYPES)}
+
+# social_accounts.last_used is only informational, so writes are buffered per process
+# and flushed in one UPDATE every LAST_USED_FLUSH_SECONDS (and at exit)
+LAST_USED_FLUSH_SECONDS = 60
+_last_used_buffer = {}
+_last_used_lock = threading.Lock()
+_last_used_flusher_pid = None
+
+# Bump whenever init_database gains new DDL so existing deployments re-run it once
+SCHEMA_VERSION = 1
+# Arbitrary constant identifying the schema migration advisory lock
+SCHEMA_LOCK_ID = 727274001
+# Set once this process has confirmed the schema is current
+_schema_ready = False
+
+# jit: queries here are short OLTP lookups where JIT compilation costs more than it saves.
+# work_mem: lets the keyword/lead sorts and hash anti-joins stay in memory.
+DEFAULT_SESSION_OPTIONS = '-c jit=off -c work_mem=16MB'
+
+# Connections are pooled per process: gunicorn preloads the app and forks,
+# and a libpq connection must never be used from two processes.
+POOL_MIN_SIZE = int(os.getenv('DB_SYNC_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.getenv('DB_SYNC_POOL_MAX_SIZE', '20'))
+_pool = None
+_pool_slots = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools inherited over fork stay referenced so this process never closes the parent's sockets
+_inherited_pools = []
+
+def _get_pool(connection_params):
+    global _pool, _pool_slots, _pool_pid
+    pid = os.getpid()
+    if _pool_pid != pid:
+        with _pool_lock:
+            if _pool_pid != pid:
+                if _pool is not None:
+                    _inherited_pools.append(_pool)
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    POOL_MIN_SIZE, POOL_MAX_SIZE,
+                    connection_factory=PreparingConnection,
+                    **connection_params
+                )
+                # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+                _pool_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+                _pool_pid = pid
+    return _pool, _pool_slots
+
 class Database:
     def __init__(self):
         self.connection_params = {
@@ -16,20 +167,76 @@ class Database:
             'database': os.getenv('DB_NAME', 'reddit_leads'),
             'user': os.getenv('DB_USER', 'postgres'),
             'password': os.getenv('DB_PASSWORD', 'password'),
-            'port': os.getenv('DB_PORT', '5432')
+            'port': os.getenv('DB_PORT', '5432'),
+            # Session settings applied when each connection starts (pooled or dedicated)
+            'options': os.getenv('DB_SESSION_OPTIONS', DEFAULT_SESSION_OPTIONS)
         }
-        self.init_database()
+        if not _schema_ready:
+            self.init_database()
     
     def get_connection(self):
-        return psycopg2.connect(**self.connection_params)
+        """Open a dedicated connection; the caller closes it. Prefer connection() for pooled access."""
+        return psycopg2.connect(connection_factory=PreparingConnection, **self.connection_params)
+    
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrow a connection from the process pool, returning it (without an open transaction) on exit"""
+        pool, slots = _get_pool(self.connection_params)
+        slots.acquire()
+        try:
+            conn = pool.getconn()
+        except Exception:
+            slots.release()
+            raise
+        
+        try:
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            pool.putconn(conn, close=bool(conn.closed))
+            slots.release()
+    
+    def _execute_prepared(self, cursor, name, params):
+        """EXECUTE a statement from PREPARED_STATEMENTS, preparing it on first use per connection"""
+        placeholders = ', '.join(['%s'] * len(params))
+        execute_sql = f"EXECUTE {name} ({placeholders})"
+        
+        conn = cursor.connection
+        if name not in conn.prepared:
+            # Sent on its own so the name is only recorded once the server has it; a
+            # prepared statement then outlives failing EXECUTEs and rollbacks
+            cursor.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+            conn.prepared.add(name)
+        cursor.execute(execute_sql, params)
     
     def init_database(self):
         """Initialize database tables if they don't exist"""
+        global _schema_ready
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Run Supabase migration first
-        self._migrate_for_supabase(cursor)
+        # Only one process runs the DDL; the others wait here and then see the new version
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        current_version = cursor.fetchone()[0] or 0
+        if current_version >= SCHEMA_VERSION:
+            conn.commit()
+            cursor.close()
+            conn.close()
+            _schema_ready = True
+            return
+        
+        print(f"🔄 Migrating database schema to version {SCHEMA_VERSION}...")
         
         # Users table
         cursor.execute('''
@@ -95,7 +302,7 @@ class Database:
                 global_lead_id INTEGER NOT NULL,
                 ai_score REAL,
                 ai_reasoning TEXT,
-                matched_keywords TEXT,
+                matched_keywords JSONB,
                 processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (business_id) REFERENCES businesses (id) ON DELETE CASCADE,
                 FOREIGN KEY (global_lead_id) REFERENCES global_leads (id) ON DELETE CASCADE,
@@ -175,6 +382,11 @@ class Database:
             )
         ''')
         
+        # Runs after the CREATE TABLEs so a fresh database has users/businesses to alter
+        self._migrate_for_supabase(cursor)
+        self._migrate_unread_notification_count(cursor)
+        self._migrate_matched_keywords_jsonb(cursor)
+        
         # Create indexes for better performance
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_businesses_user_id ON businesses(user_id)",
@@ -182,6 +394,8 @@ class Database:
 
             "CREATE INDEX IF NOT EXISTS idx_global_leads_platform ON global_leads(platform, platform_id)",
             "CREATE INDEX IF NOT EXISTS idx_business_leads_business_id ON business_leads(business_id)",
+            "CREATE INDEX IF NOT EXISTS idx_business_leads_biz_score ON business_leads(business_id, ai_score DESC, processed_at DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_business_leads_global ON business_leads(global_lead_id)",
             "CREATE INDEX IF NOT EXISTS idx_business_leads_processed_at ON business_leads(processed_at)",
             "CREATE INDEX IF NOT EXISTS idx_business_leads_ai_score ON business_leads(ai_score)",
             "CREATE INDEX IF NOT EXISTS idx_social_accounts_user_id ON social_accounts(user_id)",
@@ -190,6 +404,8 @@ class Database:
             "CREATE INDEX IF NOT EXISTS idx_notifications_type ON notifications(type)",
             "CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications(created_at)",
             "CREATE INDEX IF NOT EXISTS idx_notifications_is_read ON notifications(is_read)",
+            "CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications(user_id, created_at DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications(user_id) WHERE is_read = FALSE",
             "CREATE INDEX IF NOT EXISTS idx_user_notification_preferences_user_id ON user_notification_preferences(user_id)",
             "CREATE INDEX IF NOT EXISTS idx_business_ai_settings_business_id ON business_ai_settings(business_id)"
         ]
@@ -197,9 +413,22 @@ class Database:
         for index_sql in indexes:
             cursor.execute(index_sql)
         
+        # replies is created outside init_database, so only index it when present
+        cursor.execute("SELECT to_regclass('replies')")
+        if cursor.fetchone()[0]:
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_replies_business_lead ON replies(business_lead_id)")
+        
+        # Refresh planner statistics so the new indexes are picked up straight away
+        cursor.execute("ANALYZE business_leads")
+        cursor.execute("ANALYZE global_leads")
+        
+        cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (SCHEMA_VERSION,))
+        
         conn.commit()
         cursor.close()
         conn.close()
+        _schema_ready = True
+        print(f"✅ Database schema is at version {SCHEMA_VERSION}")
     
     def _migrate_for_supabase(self, cursor):
         """Migrate database for Supabase authentication and add public IDs"""
@@ -264,395 +493,479 @@ class Database:
             print(f"⚠️ Migration error (might be expected): {e}")
             # Don't fail if migration has issues - table might already be migrated
     
+    def _migrate_unread_notification_count(self, cursor):
+        """Add the denormalized users.unread_notification_count column and backfill it once"""
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'users' AND column_name = 'unread_notification_count'
+        """)
+        if cursor.fetchone():
+            return
+        
+        print("🔄 Adding unread_notification_count to users...")
+        cursor.execute("""
+            ALTER TABLE users 
+            ADD COLUMN unread_notification_count INTEGER NOT NULL DEFAULT 0;
+        """)
+        cursor.execute("""
+            UPDATE users u
+            SET unread_notification_count = n.unread
+            FROM (
+                SELECT user_id, COUNT(*) AS unread FROM notifications
+                WHERE is_read = FALSE GROUP BY user_id
+            ) n
+            WHERE u.id = n.user_id;
+        """)
+        print("✅ unread_notification_count backfilled!")
+    
+    def _migrate_matched_keywords_jsonb(self, cursor):
+        """Convert business_leads.matched_keywords from TEXT to JSONB and index it"""
+        cursor.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'business_leads' AND column_name = 'matched_keywords'
+        """)
+        result = cursor.fetchone()
+        if result and result[0] == 'text':
+            print("🔄 Converting business_leads.matched_keywords to JSONB...")
+            # Rows that never held valid JSON become an empty list instead of failing the cast
+            cursor.execute("""
+                CREATE FUNCTION pg_temp.matched_keywords_to_jsonb(value TEXT) RETURNS JSONB AS $$
+                BEGIN
+                    RETURN COALESCE(NULLIF(value, '')::jsonb, '[]'::jsonb);
+                EXCEPTION WHEN others THEN
+                    RETURN '[]'::jsonb;
+                END
+                $$ LANGUAGE plpgsql IMMUTABLE;
+            """)
+            cursor.execute("""
+                ALTER TABLE business_leads
+                ALTER COLUMN matched_keywords TYPE JSONB
+                USING pg_temp.matched_keywords_to_jsonb(matched_keywords);
+            """)
+            print("✅ matched_keywords converted!")
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_business_leads_kw_gin
+            ON business_leads USING GIN (matched_keywords);
+        """)
+    
     # User management
     def create_user(self, email, password):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
         
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        try:
-            cursor.execute('INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id', 
-                         (email, password_hash))
-            user_id = cursor.fetchone()[0]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Taken emails return no row instead of raising
+            cursor.execute('''
+                INSERT INTO users (email, password_hash) VALUES (%s, %s)
+                ON CONFLICT (email) DO NOTHING
+                RETURNING id
+            ''', (email, password_hash))
+            result = cursor.fetchone()
             conn.commit()
-            return user_id
-        except psycopg2.IntegrityError:
-            return None
-        finally:
             cursor.close()
-            conn.close()
-    
+        return result[0] if result else None
+        
     def verify_user(self, email, password):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cache_key = (email, hashlib.sha256(password.encode('utf-8')).hexdigest()[:32])
+        user_id = _auth_cache.get(cache_key)
+        if user_id is not None:
+            return user_id
         
-        cursor.execute('SELECT id, password_hash FROM users WHERE email = %s', (email,))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT id, password_hash FROM users WHERE email = %s', (email,))
+            result = cursor.fetchone()
+            cursor.close()
         
-        if result and bcrypt.checkpw(password.encode('utf-8'), result[1].encode('utf-8')):
+        if result and result[1] and bcrypt.checkpw(password.encode('utf-8'), result[1].encode('utf-8')):
+            _auth_cache.set(cache_key, result[0])
             return result[0]
         return None
     
     def get_user(self, user_id):
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('SELECT id, email, created_at FROM users WHERE id = %s', (user_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        result = _singleflight.do(('user', user_id), self._load_user, user_id)
         
         if result:
+            # Concurrent callers share the row, so each gets its own copy
             return dict(result)
         return None
     
+    def _load_user(self, user_id):
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('SELECT id, email, created_at FROM users WHERE id = %s', (user_id,))
+            result = cursor.fetchone()
+            cursor.close()
+        
+        return result
+    
     # Business management
     def create_business(self, user_id, name, website=None, description=None, buying_intent=None):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO businesses (user_id, name, website, description, buying_intent, public_id) 
-            VALUES (%s, %s, %s, %s, %s, gen_random_uuid()) RETURNING id, public_id
-        ''', (user_id, name, website, description, buying_intent))
-        
-        result = cursor.fetchone()
-        business_id = result[0]
-        public_id = result[1]
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO businesses (user_id, name, website, description, buying_intent, public_id) 
+                VALUES (%s, %s, %s, %s, %s, gen_random_uuid()) RETURNING id, public_id
+            ''', (user_id, name, website, description, buying_intent))
+            
+            result = cursor.fetchone()
+            business_id = result[0]
+            public_id = result[1]
+            
+            conn.commit()
+            cursor.close()
         return {"id": business_id, "public_id": str(public_id)}
     
     def get_user_businesses(self, user_id):
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT id, public_id, name, website, description, buying_intent, created_at 
-            FROM businesses WHERE user_id = %s
-        ''', (user_id,))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT id, public_id, name, website, description, buying_intent, created_at 
+                FROM businesses WHERE user_id = %s
+            ''', (user_id,))
+            
+            results = cursor.fetchall()
+            cursor.close()
         
-        return [dict(row) for row in results]
+        return results
     
     def get_business(self, business_id, user_id):
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT id, public_id, name, website, description, created_at 
-            FROM businesses WHERE id = %s AND user_id = %s
-        ''', (business_id, user_id))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT id, public_id, name, website, description, created_at 
+                FROM businesses WHERE id = %s AND user_id = %s
+            ''', (business_id, user_id))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
         if result:
-            return dict(result)
+            return result
         return None
     
     def get_business_by_public_id(self, public_id, user_id):
         """Get business by public_id instead of internal ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT id, public_id, name, website, description, buying_intent, created_at 
-            FROM businesses WHERE public_id = %s AND user_id = %s
-        ''', (public_id, user_id))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT id, public_id, name, website, description, buying_intent, created_at 
+                FROM businesses WHERE public_id = %s AND user_id = %s
+            ''', (public_id, user_id))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
         if result:
-            return dict(result)
+            return result
         return None
     
     def update_business(self, business_id, name, website=None, description=None, buying_intent=None):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE businesses 
-            SET name = %s, website = %s, description = %s, buying_intent = %s 
-            WHERE id = %s
-        ''', (name, website, description, buying_intent, business_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE businesses 
+                SET name = %s, website = %s, description = %s, buying_intent = %s 
+                WHERE id = %s
+            ''', (name, website, description, buying_intent, business_id))
+            
+            success = cursor.rowcount > 0
+            conn.commit()
+            cursor.close()
         return success
     
     # Keywords management
     def add_business_keyword(self, business_id, keyword, source='manual'):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO keywords (business_id, keyword, source) 
-            VALUES (%s, %s, %s) RETURNING id
-        ''', (business_id, keyword, source))
-        
-        keyword_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO keywords (business_id, keyword, source) 
+                VALUES (%s, %s, %s) RETURNING id
+            ''', (business_id, keyword, source))
+            
+            keyword_id = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
         return keyword_id
-    
+
+    def add_business_keywords(self, business_id, keywords, source='manual'):
+        """Insert many keywords for a business in one round trip; returns the new ids"""
+        # Drop blanks and repeats (case-insensitive) but keep the caller's order
+        seen = set()
+        rows = []
+        for keyword in keywords:
+            keyword = (keyword or '').strip()
+            if keyword and keyword.lower() not in seen:
+                seen.add(keyword.lower())
+                rows.append((business_id, keyword, source))
+        if not rows:
+            return []
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            results = psycopg2.extras.execute_values(cursor, '''
+                INSERT INTO keywords (business_id, keyword, source)
+                VALUES %s RETURNING id
+            ''', rows, fetch=True)
+            
+            conn.commit()
+            cursor.close()
+        return [row[0] for row in results]
+
     def get_business_keywords(self, business_id):
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT id, keyword, source, created_at 
-            FROM keywords WHERE business_id = %s
-        ''', (business_id,))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            self._execute_prepared(cursor, 'get_business_keywords_v1', (business_id,))
+            
+            results = cursor.fetchall()
+            cursor.close()
         
-        return [dict(row) for row in results]
+        return results
     
     def delete_business_keyword(self, keyword_id, business_id):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM keywords 
-            WHERE id = %s AND business_id = %s
-        ''', (keyword_id, business_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM keywords 
+                WHERE id = %s AND business_id = %s
+            ''', (keyword_id, business_id))
+            
+            success = cursor.rowcount > 0
+            conn.commit()
+            cursor.close()
         return success
     
     def clear_all_business_keywords(self, business_id):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM keywords WHERE business_id = %s', (business_id,))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM keywords WHERE business_id = %s', (business_id,))
+            
+            success = cursor.rowcount > 0
+            conn.commit()
+            cursor.close()
         return success
     
     # Global leads management
     def add_global_lead(self, platform, platform_id, title, content, author, url, score=0):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO global_leads (platform, platform_id, title, content, author, url, score) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
-            ''', (platform, platform_id, title, content, author, url, score))
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            self._execute_prepared(cursor, 'add_global_lead_v1', (platform, platform_id, title, content, author, url, score))
             
-            lead_id = cursor.fetchone()[0]
+            # No row back means the lead was a duplicate
+            result = cursor.fetchone()
             conn.commit()
             cursor.close()
-            conn.close()
-            return lead_id
-        except psycopg2.IntegrityError:
-            # Duplicate lead
-            cursor.close()
-            conn.close()
-            return None
+            return result[0] if result else None
     
-    def get_unprocessed_leads_for_business(self, business_id):
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    def add_global_leads(self, leads):
+        """Insert many global leads in one transaction, skipping duplicates.
+        
+        leads: iterable of (platform, platform_id, title, content, author, url, score).
+        Returns {(platform, platform_id): id} for the leads that were new.
+        """
+        rows = list(leads)
+        if not rows:
+            return {}
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Scraped leads are re-fetched on the next run, so a crash losing the
+            # last few commits is harmless; skip waiting for the WAL flush
+            cursor.execute("SET LOCAL synchronous_commit = off")
+            results = psycopg2.extras.execute_values(cursor, '''
+                INSERT INTO global_leads (platform, platform_id, title, content, author, url, score) 
+                VALUES %s
+                ON CONFLICT (platform, platform_id) DO NOTHING
+                RETURNING id, platform, platform_id
+            ''', rows, page_size=500, fetch=True)
+            
+            conn.commit()
+            cursor.close()
         
-        cursor.execute('''
-            SELECT gl.* FROM global_leads gl
-            WHERE gl.id NOT IN (
-                SELECT global_lead_id FROM business_leads WHERE business_id = %s
-            )
-            ORDER BY gl.created_at DESC
-        ''', (business_id,))
+        return {(platform, platform_id): lead_id for lead_id, platform, platform_id in results}
         
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+    def get_unprocessed_leads_for_business(self, business_id, limit=None):
+        """Yield leads this business hasn't processed yet, streamed from a server-side cursor"""
+        with self.connection() as conn:
+            cursor = conn.cursor(name='unprocessed_leads', cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.itersize = 1000
+            
+            # NOT EXISTS lets Postgres plan a hash anti-join; LIMIT NULL means no limit.
+            # The probe is served by the index behind UNIQUE(business_id, global_lead_id).
+            cursor.execute('''
+                SELECT gl.* FROM global_leads gl
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM business_leads bl
+                    WHERE bl.global_lead_id = gl.id AND bl.business_id = %s
+                )
+                ORDER BY gl.created_at DESC
+                LIMIT %s
+            ''', (business_id, limit))
+            
+            try:
+                yield from cursor
+            finally:
+                cursor.close()
         
-        return [dict(row) for row in results]
-    
     # Business leads management
     def add_business_lead(self, business_id, global_lead_id, ai_score, ai_reasoning, matched_keywords):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                # Lists are adapted to JSONB directly
+                keywords_json = psycopg2.extras.Json(matched_keywords) if isinstance(matched_keywords, list) else matched_keywords
+                
+                self._execute_prepared(cursor, 'add_business_lead_v2', (business_id, global_lead_id, ai_score, ai_reasoning, keywords_json))
+                
+                # No row back means this business already has the lead
+                result = cursor.fetchone()
+                conn.commit()
+                cursor.close()
+                return result[0] if result else None
+            except psycopg2.IntegrityError:
+                # Business or global lead no longer exists
+                cursor.close()
+                return None
         
-        try:
-            # Convert matched_keywords list to JSON string
-            keywords_json = json.dumps(matched_keywords) if isinstance(matched_keywords, list) else matched_keywords
+    def get_business_leads(self, business_id, limit=50):
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
             
             cursor.execute('''
-                INSERT INTO business_leads (business_id, global_lead_id, ai_score, ai_reasoning, matched_keywords) 
-                VALUES (%s, %s, %s, %s, %s) RETURNING id
-            ''', (business_id, global_lead_id, ai_score, ai_reasoning, keywords_json))
+                SELECT bl.*, gl.platform, gl.platform_id, gl.title, gl.content, gl.author, 
+                       gl.url, gl.score, gl.created_at
+                FROM business_leads bl
+                JOIN global_leads gl ON bl.global_lead_id = gl.id
+                WHERE bl.business_id = %s
+                ORDER BY bl.ai_score DESC, bl.processed_at DESC
+                LIMIT %s
+            ''', (business_id, limit))
             
-            lead_id = cursor.fetchone()[0]
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return lead_id
-        except psycopg2.IntegrityError:
-            # Duplicate business lead
+            results = cursor.fetchall()
             cursor.close()
-            conn.close()
-            return None
-    
-    def get_business_leads(self, business_id, limit=50):
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT bl.*, gl.platform, gl.platform_id, gl.title, gl.content, gl.author, 
-                   gl.url, gl.score, gl.created_at
-            FROM business_leads bl
-            JOIN global_leads gl ON bl.global_lead_id = gl.id
-            WHERE bl.business_id = %s
-            ORDER BY bl.ai_score DESC, bl.processed_at DESC
-            LIMIT %s
-        ''', (business_id, limit))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
         
-        leads = []
-        for row in results:
-            lead = dict(row)
-            # Parse matched_keywords JSON
-            if lead['matched_keywords']:
-                try:
-                    lead['matched_keywords'] = json.loads(lead['matched_keywords'])
-                except:
-                    lead['matched_keywords'] = []
-            else:
+        # matched_keywords is JSONB, so psycopg2 already decoded it
+        for lead in results:
+            if lead['matched_keywords'] is None:
                 lead['matched_keywords'] = []
-            leads.append(lead)
         
-        return leads    
+        return results
 
     # Replies management
     def add_reply(self, business_lead_id, user_id, reply_content, status='pending'):
         """Add a new AI reply for a business lead."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    INSERT INTO replies (business_lead_id, user_id, reply_content, status) 
+                    VALUES (%s, %s, %s, %s) RETURNING id
+                ''', (business_lead_id, user_id, reply_content, status))
+                
+                reply_id = cursor.fetchone()[0]
+                conn.commit()
+                cursor.close()
+                return reply_id
+            except psycopg2.IntegrityError:
+                # Reply already exists for this lead
+                cursor.close()
+                return None
         
-        try:
-            cursor.execute('''
-                INSERT INTO replies (business_lead_id, user_id, reply_content, status) 
-                VALUES (%s, %s, %s, %s) RETURNING id
-            ''', (business_lead_id, user_id, reply_content, status))
+    def update_reply_status(self, reply_id, status, platform_reply_id=None):
+        """Update reply status (pending -> submitted -> posted)."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            update_fields = ['status = %s', 'updated_at = CURRENT_TIMESTAMP']
+            params = [status]
             
-            reply_id = cursor.fetchone()[0]
+            if status == 'submitted' and platform_reply_id:
+                update_fields.append('platform_reply_id = %s')
+                update_fields.append('submitted_at = CURRENT_TIMESTAMP')
+                params.extend([platform_reply_id])
+            
+            params.append(reply_id)
+            
+            cursor.execute(f'''
+                UPDATE replies 
+                SET {', '.join(update_fields)}
+                WHERE id = %s
+            ''', params)
+            
+            success = cursor.rowcount > 0
             conn.commit()
             cursor.close()
-            conn.close()
-            return reply_id
-        except psycopg2.IntegrityError:
-            # Reply already exists for this lead
+        return success
+    
+    def get_user_replies(self, user_id, status=None, limit=50):
+        """Get replies for a user, optionally filtered by status."""
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            base_query = '''
+                SELECT r.*, bl.ai_score, 
+                       gl.title as lead_title, gl.platform as lead_platform, gl.url as lead_url,
+                       gl.author as lead_author,
+                       b.name as business_name
+                FROM replies r
+                JOIN business_leads bl ON r.business_lead_id = bl.id
+                JOIN global_leads gl ON bl.global_lead_id = gl.id
+                JOIN businesses b ON bl.business_id = b.id
+                WHERE r.user_id = %s
+            '''
+            
+            params = [user_id]
+            
+            if status:
+                base_query += ' AND r.status = %s'
+                params.append(status)
+            
+            base_query += ' ORDER BY r.created_at DESC LIMIT %s'
+            params.append(limit)
+            
+            cursor.execute(base_query, params)
+            results = cursor.fetchall()
             cursor.close()
-            conn.close()
-            return None
-    
-    def update_reply_status(self, reply_id, status, platform_reply_id=None):
-        """Update reply status (pending -> submitted -> posted)."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        update_fields = ['status = %s', 'updated_at = CURRENT_TIMESTAMP']
-        params = [status]
-        
-        if status == 'submitted' and platform_reply_id:
-            update_fields.append('platform_reply_id = %s')
-            update_fields.append('submitted_at = CURRENT_TIMESTAMP')
-            params.extend([platform_reply_id])
-        
-        params.append(reply_id)
-        
-        cursor.execute(f'''
-            UPDATE replies 
-            SET {', '.join(update_fields)}
-            WHERE id = %s
-        ''', params)
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return success
-    
-    def get_user_replies(self, user_id, status=None, limit=50):
-        """Get replies for a user, optionally filtered by status."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        base_query = '''
-            SELECT r.*, bl.ai_score, 
-                   gl.title as lead_title, gl.platform as lead_platform, gl.url as lead_url,
-                   gl.author as lead_author,
-                   b.name as business_name
-            FROM replies r
-            JOIN business_leads bl ON r.business_lead_id = bl.id
-            JOIN global_leads gl ON bl.global_lead_id = gl.id
-            JOIN businesses b ON bl.business_id = b.id
-            WHERE r.user_id = %s
-        '''
-        
-        params = [user_id]
-        
-        if status:
-            base_query += ' AND r.status = %s'
-            params.append(status)
-        
-        base_query += ' ORDER BY r.created_at DESC LIMIT %s'
-        params.append(limit)
-        
-        cursor.execute(base_query, params)
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return [dict(row) for row in results]
+        
+        return results
     
     def get_reply_stats(self, user_id):
         """Get reply statistics for dashboard."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_replies,
-                COUNT(CASE WHEN status = 'submitted' THEN 1 END) as submitted_replies,
-                COUNT(CASE WHEN DATE(submitted_at) = CURRENT_DATE THEN 1 END) as replies_today,
-                COUNT(CASE WHEN submitted_at >= CURRENT_DATE - INTERVAL '7 days' THEN 1 END) as replies_this_week
-            FROM replies r
-            JOIN business_leads bl ON r.business_lead_id = bl.id
-            JOIN businesses b ON bl.business_id = b.id
-            WHERE b.user_id = %s
-        ''', (user_id,))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT 
+                    COUNT(*) as total_replies,
+                    COUNT(CASE WHEN status = 'submitted' THEN 1 END) as submitted_replies,
+                    COUNT(CASE WHEN DATE(submitted_at) = CURRENT_DATE THEN 1 END) as replies_today,
+                    COUNT(CASE WHEN submitted_at >= CURRENT_DATE - INTERVAL '7 days' THEN 1 END) as replies_this_week
+                FROM replies r
+                JOIN business_leads bl ON r.business_lead_id = bl.id
+                JOIN businesses b ON bl.business_id = b.id
+                WHERE b.user_id = %s
+            ''', (user_id,))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
         return {
             'total_replies': result[0] or 0,
@@ -663,90 +976,87 @@ class Database:
   # Platform settings management
     def get_user_platform_settings(self, user_id):
         """Get all platform settings for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT platform_id, is_active, auto_reply, confidence_threshold, write_reply_suggestion, updated_at
-            FROM platform_settings
-            WHERE user_id = %s
-            ORDER BY platform_id
-        ''', (user_id,))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT platform_id, is_active, auto_reply, confidence_threshold, write_reply_suggestion, updated_at
+                FROM platform_settings
+                WHERE user_id = %s
+                ORDER BY platform_id
+            ''', (user_id,))
+            
+            results = cursor.fetchall()
+            cursor.close()
         
-        return [dict(row) for row in results]
+        return results
     
     def get_platform_setting(self, user_id, platform_id):
         """Get specific platform setting for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT platform_id, is_active, auto_reply, confidence_threshold, write_reply_suggestion, updated_at
-            FROM platform_settings
-            WHERE user_id = %s AND platform_id = %s
-        ''', (user_id, platform_id))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT platform_id, is_active, auto_reply, confidence_threshold, write_reply_suggestion, updated_at
+                FROM platform_settings
+                WHERE user_id = %s AND platform_id = %s
+            ''', (user_id, platform_id))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
-        return dict(result) if result else None
+        return result
     
     def update_platform_setting(self, user_id, platform_id, is_active=None, auto_reply=None, confidence_threshold=None, write_reply_suggestion=None):
         """Update platform settings for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Build dynamic update query
-        update_fields = ['updated_at = CURRENT_TIMESTAMP']
-        params = []
-        
-        if is_active is not None:
-            update_fields.append('is_active = %s')
-            params.append(is_active)
-        
-        if auto_reply is not None:
-            update_fields.append('auto_reply = %s')
-            params.append(auto_reply)
-        
-        if confidence_threshold is not None:
-            update_fields.append('confidence_threshold = %s')
-            params.append(confidence_threshold)
-        
-        if write_reply_suggestion is not None:
-            update_fields.append('write_reply_suggestion = %s')
-            params.append(write_reply_suggestion)
-        
-        params.extend([user_id, platform_id])
-        
-        # Try to update existing record
-        cursor.execute(f'''
-            UPDATE platform_settings 
-            SET {', '.join(update_fields)}
-            WHERE user_id = %s AND platform_id = %s
-        ''', params)
-        
-        # If no record exists, create one
-        if cursor.rowcount == 0:
-            cursor.execute('''
-                INSERT INTO platform_settings (user_id, platform_id, is_active, auto_reply, confidence_threshold, write_reply_suggestion)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (
-                user_id, 
-                platform_id, 
-                is_active if is_active is not None else False,
-                auto_reply if auto_reply is not None else False,
-                confidence_threshold if confidence_threshold is not None else 80,
-                write_reply_suggestion if write_reply_suggestion is not None else False
-            ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Build dynamic update query
+            update_fields = ['updated_at = CURRENT_TIMESTAMP']
+            params = []
+            
+            if is_active is not None:
+                update_fields.append('is_active = %s')
+                params.append(is_active)
+            
+            if auto_reply is not None:
+                update_fields.append('auto_reply = %s')
+                params.append(auto_reply)
+            
+            if confidence_threshold is not None:
+                update_fields.append('confidence_threshold = %s')
+                params.append(confidence_threshold)
+            
+            if write_reply_suggestion is not None:
+                update_fields.append('write_reply_suggestion = %s')
+                params.append(write_reply_suggestion)
+            
+            params.extend([user_id, platform_id])
+            
+            # Try to update existing record
+            cursor.execute(f'''
+                UPDATE platform_settings 
+                SET {', '.join(update_fields)}
+                WHERE user_id = %s AND platform_id = %s
+            ''', params)
+            
+            # If no record exists, create one
+            if cursor.rowcount == 0:
+                cursor.execute('''
+                    INSERT INTO platform_settings (user_id, platform_id, is_active, auto_reply, confidence_threshold, write_reply_suggestion)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                ''', (
+                    user_id, 
+                    platform_id, 
+                    is_active if is_active is not None else False,
+                    auto_reply if auto_reply is not None else False,
+                    confidence_threshold if confidence_threshold is not None else 80,
+                    write_reply_suggestion if write_reply_suggestion is not None else False
+                ))
+            
+            conn.commit()
+            cursor.close()
         return True
     
     def should_auto_reply(self, user_id, platform_id, ai_score):
@@ -771,322 +1081,439 @@ class Database:
     # Social accounts management
     def add_social_account(self, user_id, platform, username, password, notes=None):
         """Add a new social media account for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Simple encryption for password (in production, use proper encryption)
-        import base64
-        password_encrypted = base64.b64encode(password.encode()).decode()
-        
-        try:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            password_encrypted = _encrypt_social_password(password)
+            
+            # An account already saved for this user/platform returns no row instead of raising
             cursor.execute('''
                 INSERT INTO social_accounts (user_id, platform, username, password_encrypted, notes)
-                VALUES (%s, %s, %s, %s, %s) RETURNING id
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, platform, username) DO NOTHING
+                RETURNING id
             ''', (user_id, platform, username, password_encrypted, notes))
             
-            account_id = cursor.fetchone()[0]
+            result = cursor.fetchone()
             conn.commit()
-            return account_id
-        except psycopg2.IntegrityError:
-            return None
-        finally:
             cursor.close()
-            conn.close()
-    
+        return result[0] if result else None
+        
     def get_user_social_accounts(self, user_id):
         """Get all social accounts for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT id, platform, username, is_active, is_verified, last_used, notes, created_at
-            FROM social_accounts 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC
-        ''', (user_id,))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT id, platform, username, is_active, is_verified, last_used, notes, created_at
+                FROM social_accounts 
+                WHERE user_id = %s 
+                ORDER BY created_at DESC
+            ''', (user_id,))
+            
+            results = cursor.fetchall()
+            cursor.close()
         
-        return [dict(row) for row in results]
+        return results
     
     def get_social_account_with_password(self, account_id, user_id):
         """Get social account with decrypted password (for internal use)."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT id, platform, username, password_encrypted, is_active, is_verified, notes
-            FROM social_accounts 
-            WHERE id = %s AND user_id = %s
-        ''', (account_id, user_id))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT id, platform, username, password_encrypted, is_active, is_verified, notes
+                FROM social_accounts 
+                WHERE id = %s AND user_id = %s
+            ''', (account_id, user_id))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
         if result:
-            account = dict(result)
-            # Decrypt password
-            import base64
-            account['password'] = base64.b64decode(account['password_encrypted']).decode()
+            account = result
+            account['password'] = _decrypt_social_password(account['password_encrypted'])
             del account['password_encrypted']
             return account
         return None
     
     def update_social_account_status(self, account_id, user_id, is_active):
-        """Update the active status of a social account."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE social_accounts 
-            SET is_active = %s 
-            WHERE id = %s AND user_id = %s
-        ''', (is_active, account_id, user_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        """Update the active status of a social account. Returns the updated account or None."""
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                UPDATE social_accounts 
+                SET is_active = %s 
+                WHERE id = %s AND user_id = %s
+                RETURNING id, platform, username, is_active, is_verified, last_used, notes, created_at
+            ''', (is_active, account_id, user_id))
+            
+            result = cursor.fetchone()
+            conn.commit()
+            cursor.close()
         
-        return success
+        return result
     
     def delete_social_account(self, account_id, user_id):
-        """Delete a social account."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM social_accounts 
-            WHERE id = %s AND user_id = %s
-        ''', (account_id, user_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        """Delete a social account. Returns the deleted account id or None."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM social_accounts 
+                WHERE id = %s AND user_id = %s
+                RETURNING id
+            ''', (account_id, user_id))
+            
+            result = cursor.fetchone()
+            conn.commit()
+            cursor.close()
         
-        return success
+        return result[0] if result else None
     
     def update_social_account_last_used(self, account_id):
-        """Update the last_used timestamp for a social account."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE social_accounts 
-            SET last_used = CURRENT_TIMESTAMP 
-            WHERE id = %s
-        ''', (account_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()    
+        """Record use of a social account; persisted by the periodic last_used flush."""
+        with _last_used_lock:
+            _last_used_buffer[account_id] = datetime.now(timezone.utc)
+        self._ensure_last_used_flusher()
+    
+    def flush_social_account_last_used(self):
+        """Write buffered last_used timestamps in a single UPDATE. Returns rows flushed."""
+        global _last_used_buffer
+        with _last_used_lock:
+            pending, _last_used_buffer = _last_used_buffer, {}
+        if not pending:
+            return 0
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                psycopg2.extras.execute_values(cursor, '''
+                    UPDATE social_accounts SET last_used = v.last_used
+                    FROM (VALUES %s) AS v(id, last_used)
+                    WHERE social_accounts.id = v.id
+                ''', list(pending.items()), template="(%s, %s::timestamptz AT TIME ZONE 'UTC')")
+                conn.commit()
+                return len(pending)
+            except Exception:
+                conn.rollback()
+                # Put entries back unless a newer timestamp arrived meanwhile
+                with _last_used_lock:
+                    for account_id, last_used in pending.items():
+                        _last_used_buffer.setdefault(account_id, last_used)
+                raise
+            finally:
+                cursor.close()
+        
+    def _ensure_last_used_flusher(self):
+        """Start the last_used flush thread once per process (forked workers get their own)"""
+        global _last_used_flusher_pid
+        with _last_used_lock:
+            if _last_used_flusher_pid == os.getpid():
+                return
+            _last_used_flusher_pid = os.getpid()
+        
+        def flush_quietly():
+            try:
+                self.flush_social_account_last_used()
+            except Exception as e:
+                print(f"⚠️ Failed to flush social account last_used: {e}")
+        
+        def flush_forever():
+            while True:
+                time.sleep(LAST_USED_FLUSH_SECONDS)
+                flush_quietly()
+        
+        threading.Thread(target=flush_forever, name='last-used-flush', daemon=True).start()
+        atexit.register(flush_quietly)
 
     # Notifications management
     def create_notification(self, user_id, notification_type, title, message, data=None, priority='normal'):
         """Create a new notification for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO notifications (user_id, type, title, message, data, priority)
-                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
-            ''', (user_id, notification_type, title, message, json.dumps(data) if data else None, priority))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            notification_id = cursor.fetchone()[0]
-            conn.commit()
-            return notification_id
-        except Exception as e:
-            conn.rollback()
-            return None
-        finally:
-            cursor.close()
-            conn.close()
-    
+            try:
+                # Insert and bump the unread counter in one statement / round trip
+                cursor.execute('''
+                    WITH inserted AS (
+                        INSERT INTO notifications (user_id, type, title, message, data, priority)
+                        VALUES (%s, %s, %s, %s, %s, %s) RETURNING id, user_id
+                    ), counted AS (
+                        UPDATE users SET unread_notification_count = unread_notification_count + 1
+                        WHERE id = (SELECT user_id FROM inserted)
+                    )
+                    SELECT id FROM inserted
+                ''', (user_id, notification_type, title, message, data or None, priority))
+                
+                notification_id = cursor.fetchone()[0]
+                conn.commit()
+                return notification_id
+            except Exception as e:
+                conn.rollback()
+                return None
+            finally:
+                cursor.close()
+        
     def get_user_notifications(self, user_id, limit=50, unread_only=False):
         """Get notifications for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        where_clause = "WHERE user_id = %s"
-        params = [user_id]
-        
-        if unread_only:
-            where_clause += " AND is_read = FALSE"
-        
-        cursor.execute(f'''
-            SELECT id, type, title, message, data, is_read, priority, created_at, read_at
-            FROM notifications 
-            {where_clause}
-            ORDER BY created_at DESC 
-            LIMIT %s
-        ''', params + [limit])
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        notifications = []
-        for row in results:
-            notification = dict(row)
-            # JSONB data is already parsed by psycopg2, no need to json.loads
-            notifications.append(notification)
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            where_clause = "WHERE user_id = %s"
+            params = [user_id]
+            
+            if unread_only:
+                where_clause += " AND is_read = FALSE"
+            
+            cursor.execute(f'''
+                SELECT id, type, title, message, data, is_read, priority, created_at, read_at
+                FROM notifications 
+                {where_clause}
+                ORDER BY created_at DESC 
+                LIMIT %s
+            ''', params + [limit])
+            
+            results = cursor.fetchall()
+            cursor.close()
         
-        return notifications
+        # JSONB data is already parsed by psycopg2, no need to json.loads
+        return results
     
     def mark_notification_read(self, notification_id, user_id):
         """Mark a notification as read."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE notifications 
-            SET is_read = TRUE, read_at = CURRENT_TIMESTAMP 
-            WHERE id = %s AND user_id = %s
-        ''', (notification_id, user_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Self-join exposes the pre-update is_read so the counter only moves on a real transition
+            cursor.execute('''
+                WITH changed AS (
+                    UPDATE notifications n
+                    SET is_read = TRUE, read_at = CURRENT_TIMESTAMP 
+                    FROM notifications old
+                    WHERE n.id = old.id AND n.id = %s AND n.user_id = %s
+                    RETURNING old.is_read AS was_read
+                ), counted AS (
+                    UPDATE users SET unread_notification_count = GREATEST(unread_notification_count - 1, 0)
+                    WHERE id = %s AND EXISTS (SELECT 1 FROM changed WHERE NOT was_read)
+                )
+                SELECT was_read FROM changed
+            ''', (notification_id, user_id, user_id))
+            
+            success = cursor.fetchone() is not None
+            conn.commit()
+            cursor.close()
         
         return success
     
     def mark_all_notifications_read(self, user_id):
         """Mark all notifications as read for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE notifications 
-            SET is_read = TRUE, read_at = CURRENT_TIMESTAMP 
-            WHERE user_id = %s AND is_read = FALSE
-        ''', (user_id,))
-        
-        count = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                WITH changed AS (
+                    UPDATE notifications 
+                    SET is_read = TRUE, read_at = CURRENT_TIMESTAMP 
+                    WHERE user_id = %s AND is_read = FALSE
+                    RETURNING id
+                ), counted AS (
+                    UPDATE users SET unread_notification_count = GREATEST(unread_notification_count - (SELECT COUNT(*) FROM changed), 0)
+                    WHERE id = %s AND EXISTS (SELECT 1 FROM changed)
+                )
+                SELECT COUNT(*) FROM changed
+            ''', (user_id, user_id))
+            
+            count = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
         
         return count
     
     def get_unread_notification_count(self, user_id):
         """Get count of unread notifications for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM notifications 
-            WHERE user_id = %s AND is_read = FALSE
-        ''', (user_id,))
-        
-        count = cursor.fetchone()[0]
-        cursor.close()
-        conn.close()
+        return _singleflight.do(('unread_count', user_id), self._load_unread_notification_count, user_id)
+    
+    def _load_unread_notification_count(self, user_id):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT unread_notification_count FROM users WHERE id = %s', (user_id,))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
-        return count
+        return result[0] if result else 0
     
     def delete_notification(self, notification_id, user_id):
         """Delete a notification."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM notifications 
-            WHERE id = %s AND user_id = %s
-        ''', (notification_id, user_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                WITH deleted AS (
+                    DELETE FROM notifications 
+                    WHERE id = %s AND user_id = %s
+                    RETURNING is_read
+                ), counted AS (
+                    UPDATE users SET unread_notification_count = GREATEST(unread_notification_count - 1, 0)
+                    WHERE id = %s AND EXISTS (SELECT 1 FROM deleted WHERE NOT is_read)
+                )
+                SELECT is_read FROM deleted
+            ''', (notification_id, user_id, user_id))
+            
+            success = cursor.fetchone() is not None
+            conn.commit()
+            cursor.close()
         
         return success
     
     # Notification preferences management
     def get_user_notification_preferences(self, user_id):
         """Get notification preferences for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT notification_type, email_enabled, push_enabled
-            FROM user_notification_preferences 
-            WHERE user_id = %s
-        ''', (user_id,))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT notification_type, email_enabled, push_enabled
+                FROM user_notification_preferences 
+                WHERE user_id = %s
+            ''', (user_id,))
+            
+            results = cursor.fetchall()
+            cursor.close()
         
-        return [dict(row) for row in results]
+        return results
     
     def update_notification_preference(self, user_id, notification_type, email_enabled=None, push_enabled=None):
         """Update notification preferences for a user."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Insert or update preference
-        cursor.execute('''
-            INSERT INTO user_notification_preferences (user_id, notification_type, email_enabled, push_enabled)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (user_id, notification_type)
-            DO UPDATE SET 
-                email_enabled = COALESCE(%s, user_notification_preferences.email_enabled),
-                push_enabled = COALESCE(%s, user_notification_preferences.push_enabled),
-                updated_at = CURRENT_TIMESTAMP
-        ''', (user_id, notification_type, email_enabled, push_enabled, email_enabled, push_enabled))
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            # Insert or update preference, returning the resulting state
+            cursor.execute('''
+                INSERT INTO user_notification_preferences (user_id, notification_type, email_enabled, push_enabled)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (user_id, notification_type)
+                DO UPDATE SET 
+                    email_enabled = COALESCE(%s, user_notification_preferences.email_enabled),
+                    push_enabled = COALESCE(%s, user_notification_preferences.push_enabled),
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING notification_type, email_enabled, push_enabled
+            ''', (user_id, notification_type, email_enabled, push_enabled, email_enabled, push_enabled))
+            
+            preference = cursor.fetchone()
+            conn.commit()
+            cursor.close()
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        _email_mask_cache.delete(user_id)
+        return preference
+    
+    def get_email_disabled_masks_bulk(self, user_ids):
+        """Get each user's email-disabled bitmask (see EMAIL_NOTIFICATION_BITS), keyed by user id."""
+        masks = {}
+        missing = []
+        for user_id in user_ids:
+            cached = _email_mask_cache.get(user_id)
+            if cached is not None:
+                masks[user_id] = cached
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            generations = {user_id: _email_mask_cache.generation(user_id) for user_id in missing}
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                # No row means enabled, so only opted-out types contribute bits
+                cursor.execute('''
+                    SELECT user_id, notification_type FROM user_notification_preferences 
+                    WHERE user_id = ANY(%s) AND email_enabled IS NOT TRUE
+                ''', (missing,))
+                
+                rows = cursor.fetchall()
+                cursor.close()
+            
+            for user_id in missing:
+                masks[user_id] = 0
+            for user_id, notification_type in rows:
+                masks[user_id] |= EMAIL_NOTIFICATION_BITS.get(notification_type, 0)
+            for user_id in missing:
+                _email_mask_cache.set(user_id, masks[user_id], generation=generations[user_id])
+        
+        return masks
+    
+    def _get_email_disabled_mask(self, user_id):
+        cached = _email_mask_cache.get(user_id)
+        if cached is not None:
+            return cached
         
-        return True
+        masks = _singleflight.do(('email_mask', user_id), self.get_email_disabled_masks_bulk, [user_id])
+        return masks[user_id]
     
     def should_send_email_notification(self, user_id, notification_type):
         """Check if email notifications are enabled for a user and notification type."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        bit = EMAIL_NOTIFICATION_BITS.get(notification_type)
+        if bit is None:
+            return self._email_enabled_uncached(user_id, notification_type)
         
-        cursor.execute('''
-            SELECT email_enabled FROM user_notification_preferences 
-            WHERE user_id = %s AND notification_type = %s
-        ''', (user_id, notification_type))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        mask = self._get_email_disabled_mask(user_id)
+        return not mask & bit
+    
+    def _email_enabled_uncached(self, user_id, notification_type):
+        """Direct preference lookup for notification types outside EMAIL_NOTIFICATION_BITS."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT email_enabled FROM user_notification_preferences 
+                WHERE user_id = %s AND notification_type = %s
+            ''', (user_id, notification_type))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
         # Default to True if no preference is set
-        return result[0] if result else True    
+        return result[0] if result else True
 
     # Business AI settings management
     def get_business_ai_settings(self, business_id):
         """Get AI reply settings for a business."""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT * FROM business_ai_settings 
-            WHERE business_id = %s
-        ''', (business_id,))
+        cached = _ai_settings_cache.get(business_id)
+        if cached is not None:
+            return dict(cached)
         
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        settings = _singleflight.do(('business_ai_settings', business_id), self._load_business_ai_settings, business_id)
+        return dict(settings)
+    
+    def _load_business_ai_settings(self, business_id):
+        generation = _ai_settings_cache.generation(business_id)
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                SELECT * FROM business_ai_settings 
+                WHERE business_id = %s
+            ''', (business_id,))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
         if result:
-            settings = dict(result)
+            settings = result
             # Parse JSON fields
             if settings['service_links']:
                 settings['service_links'] = settings['service_links']
-            return settings
+        else:
+            settings = self._default_business_ai_settings(business_id)
         
-        # Return default settings if none exist
+        _ai_settings_cache.set(business_id, settings, generation=generation)
+        return settings
+    
+    def _default_business_ai_settings(self, business_id):
+        """Default AI reply settings for a business without a saved row."""
         return {
             'business_id': business_id,
             'persona': '',
@@ -1102,106 +1529,100 @@ class Database:
     
     def update_business_ai_settings(self, business_id, settings):
         """Update AI reply settings for a business."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO business_ai_settings (
-                business_id, persona, instructions, bad_words, service_links,
-                tone, max_reply_length, include_links, auto_reply_enabled, confidence_threshold
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (business_id)
-            DO UPDATE SET 
-                persona = EXCLUDED.persona,
-                instructions = EXCLUDED.instructions,
-                bad_words = EXCLUDED.bad_words,
-                service_links = EXCLUDED.service_links,
-                tone = EXCLUDED.tone,
-                max_reply_length = EXCLUDED.max_reply_length,
-                include_links = EXCLUDED.include_links,
-                auto_reply_enabled = EXCLUDED.auto_reply_enabled,
-                confidence_threshold = EXCLUDED.confidence_threshold,
-                updated_at = CURRENT_TIMESTAMP
-        ''', (
-            business_id,
-            settings.get('persona', ''),
-            settings.get('instructions', ''),
-            settings.get('bad_words', []),
-            json.dumps(settings.get('service_links', {})),
-            settings.get('tone', 'professional'),
-            settings.get('max_reply_length', 500),
-            settings.get('include_links', True),
-            settings.get('auto_reply_enabled', False),
-            settings.get('confidence_threshold', 0.8)
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                INSERT INTO business_ai_settings (
+                    business_id, persona, instructions, bad_words, service_links,
+                    tone, max_reply_length, include_links, auto_reply_enabled, confidence_threshold
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (business_id)
+                DO UPDATE SET 
+                    persona = EXCLUDED.persona,
+                    instructions = EXCLUDED.instructions,
+                    bad_words = EXCLUDED.bad_words,
+                    service_links = EXCLUDED.service_links,
+                    tone = EXCLUDED.tone,
+                    max_reply_length = EXCLUDED.max_reply_length,
+                    include_links = EXCLUDED.include_links,
+                    auto_reply_enabled = EXCLUDED.auto_reply_enabled,
+                    confidence_threshold = EXCLUDED.confidence_threshold,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING *
+            ''', (
+                business_id,
+                settings.get('persona', ''),
+                settings.get('instructions', ''),
+                settings.get('bad_words', []),
+                # Json rather than the dict adapter, since service_links may also be a list
+                psycopg2.extras.Json(settings.get('service_links', {})),
+                settings.get('tone', 'professional'),
+                settings.get('max_reply_length', 500),
+                settings.get('include_links', True),
+                settings.get('auto_reply_enabled', False),
+                settings.get('confidence_threshold', 0.8)
+            ))
+            
+            settings = cursor.fetchone()
+            conn.commit()
+            cursor.close()
         
-        return True    
+        # Invalidate rather than set, so a load still in flight can't cache the old row
+        _ai_settings_cache.delete(business_id)
+        return dict(settings)
 
     # Additional reply management methods
     def get_reply_by_id(self, reply_id, user_id):
         """Get a specific reply by ID, ensuring user ownership through business"""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cursor.execute('''
-            SELECT r.*, bl.business_id, gl.title as lead_title, gl.url as lead_url, 
-                   gl.platform as lead_platform, 
-                   gl.author as lead_author, bl.ai_score
-            FROM replies r
-            JOIN business_leads bl ON r.business_lead_id = bl.id
-            JOIN businesses b ON bl.business_id = b.id
-            JOIN global_leads gl ON bl.global_lead_id = gl.id
-            WHERE r.id = %s AND b.user_id = %s
-        ''', (reply_id, user_id))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            self._execute_prepared(cursor, 'get_reply_by_id_v1', (reply_id, user_id))
+            
+            result = cursor.fetchone()
+            cursor.close()
         
-        return dict(result) if result else None
+        return result
     
     def update_reply_content(self, reply_id, content):
         """Update reply content"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE replies 
-            SET reply_content = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s AND status = 'draft'
-        ''', (content, reply_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            
+            cursor.execute('''
+                UPDATE replies 
+                SET reply_content = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status = 'draft'
+                RETURNING reply_content, updated_at
+            ''', (content, reply_id))
+            
+            result = cursor.fetchone()
+            conn.commit()
+            cursor.close()
         
-        return success
+        # Updated row, or None when the reply is missing or no longer a draft
+        return result
     
     def delete_reply(self, reply_id, user_id):
         """Delete a reply (only drafts and failed)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM replies 
-            WHERE id = %s 
-            AND status IN ('draft', 'failed')
-            AND business_lead_id IN (
-                SELECT bl.id FROM business_leads bl
-                JOIN businesses b ON bl.business_id = b.id
-                WHERE b.user_id = %s
-            )
-        ''', (reply_id, user_id))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM replies 
+                WHERE id = %s 
+                AND status IN ('draft', 'failed')
+                AND business_lead_id IN (
+                    SELECT bl.id FROM business_leads bl
+                    JOIN businesses b ON bl.business_id = b.id
+                    WHERE b.user_id = %s
+                )
+            ''', (reply_id, user_id))
+            
+            success = cursor.rowcount > 0
+            conn.commit()
+            cursor.close()
         
         return success
\ No newline at end of file
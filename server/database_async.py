@@ -0,0 +1,71 @@
+import asyncpg
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class AsyncDatabase:
+    """
+    Async read path for the high-QPS endpoints, backed by a shared asyncpg pool.
+    Writes and everything else stay on the sync Database class.
+    """
+
+    def __init__(self):
+        self.connection_params = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'database': os.getenv('DB_NAME', 'reddit_leads'),
+            'user': os.getenv('DB_USER', 'postgres'),
+            'password': os.getenv('DB_PASSWORD', 'password'),
+            'port': int(os.getenv('DB_PORT', '5432'))
+        }
+        # Every worker process opens its own pool next to the sync one, and it only
+        # serves the leads endpoint, so keep it small and sized separately
+        self.min_pool_size = int(os.getenv('DB_ASYNC_POOL_MIN_SIZE', '1'))
+        self.max_pool_size = int(os.getenv('DB_ASYNC_POOL_MAX_SIZE', '5'))
+        self.pool = None
+
+    async def init(self):
+        """Create the connection pool (call once per worker process)"""
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                min_size=self.min_pool_size,
+                max_size=self.max_pool_size,
+                statement_cache_size=1024,
+                init=self._init_connection,
+                **self.connection_params
+            )
+        return self.pool
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    @staticmethod
+    async def _init_connection(conn):
+        # Decode JSONB columns to Python objects like psycopg2 does
+        await conn.set_type_codec('jsonb', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+    # Business leads
+    async def get_business_leads(self, business_id, limit=50):
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('''
+                SELECT bl.*, gl.platform, gl.platform_id, gl.title, gl.content, gl.author,
+                       gl.url, gl.score, gl.created_at
+                FROM business_leads bl
+                JOIN global_leads gl ON bl.global_lead_id = gl.id
+                WHERE bl.business_id = $1
+                ORDER BY bl.ai_score DESC, bl.processed_at DESC
+                LIMIT $2
+            ''', business_id, limit)
+
+        leads = []
+        for row in rows:
+            lead = dict(row)
+            # matched_keywords is JSONB, decoded by the connection codec
+            if lead['matched_keywords'] is None:
+                lead['matched_keywords'] = []
+            leads.append(lead)
+
+        return leads
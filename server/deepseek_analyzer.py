@@ -1,11 +1,189 @@
 import os
-import requests
+import hashlib
 import json
-from typing import Dict, List, Optional
+import logging
+import random
+import re
+import time
+import orjson
+import requests
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+from cache import TTLCache
+from http_client import CircuitBreaker, TokenBucket, create_session
+from keyword_matcher import KeywordMatcher
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Exact-match cache of parsed single-lead analyses (temperature 0), keyed on a hash
+# of the request, so reruns over the same lead skip the paid round trip. Only replies
+# that parsed and validated are stored; a cut-off or malformed one is retried next time
+_response_cache = TTLCache(maxsize=2048, ttl=int(os.getenv('DEEPSEEK_CACHE_TTL_SECONDS', '86400')))
+
+# DeepSeek caches shared request prefixes server-side, so lead prompts put everything
+# that is constant per business (system message, business context, rubric, output
+# format) first and the lead text last. Keep these messages byte-identical across calls;
+# they are built once here and shared by every request (never mutate them).
+LEAD_ANALYSIS_SYSTEM_MESSAGE = {"role": "system", "content": "You are an expert at qualifying business leads and identifying potential customers."}
+BATCH_ANALYSIS_SYSTEM_MESSAGE = {"role": "system", "content": "You are an expert at qualifying business leads and identifying potential customers. Analyze each lead carefully and return valid JSON."}
+WEBSITE_KEYWORDS_SYSTEM_MESSAGE = {"role": "system", "content": "You are an expert at identifying customer pain points and search patterns for lead generation."}
+WEBSITE_SETUP_SYSTEM_MESSAGE = {"role": "system", "content": "You are an expert business analyst and marketing strategist. Analyze websites thoroughly and create comprehensive lead generation setups."}
+DESCRIPTION_SETUP_SYSTEM_MESSAGE = {"role": "system", "content": "You are an expert business analyst. Create comprehensive lead generation setups based on business descriptions."}
+
+_json_decoder = json.JSONDecoder()
+
+def _extract_json(text: str, opener: str, first_only: bool = False):
+    """
+    Parse the first complete JSON value starting with opener ('[' or '{') in a
+    model response, ignoring prose before and after it. raw_decode stops at the
+    end of the value, so trailing text containing brackets no longer breaks the
+    slice. Returns None if the text has no opener; raises JSONDecodeError if
+    none of the candidates parse.
+    first_only only tries the value at the first opener. Use it for bare JSON
+    replies, where a later opener is a nested value and decoding it would pass
+    off a fragment (e.g. one lead of a cut-off batch) as the whole reply.
+    """
+    start = text.find(opener)
+    error = None
+    while start != -1:
+        try:
+            return _json_decoder.raw_decode(text, start)[0]
+        except json.JSONDecodeError as e:
+            if first_only:
+                raise
+            error = error or e
+            start = text.find(opener, start + 1)
+    if error:
+        raise error
+    return None
+
+# Shared by every analyzer in the process (API workers' threads, batch pool) so bursts
+# are paced below DeepSeek's limit instead of tripping 429s and retries
+_rate_limiter = TokenBucket(
+    rate=float(os.getenv('DEEPSEEK_RATE_LIMIT_RPS', '5')),
+    burst=int(os.getenv('DEEPSEEK_RATE_LIMIT_BURST', '10'))
+)
+
+# When DeepSeek is down or timing out, stop sending for a while instead of every
+# batch sitting through its own timeouts and retries
+_circuit_breaker = CircuitBreaker(
+    fail_max=int(os.getenv('DEEPSEEK_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.getenv('DEEPSEEK_BREAKER_RESET_SECONDS', '30'))
+)
+
+class LeadAnalysis(BaseModel):
+    """
+    One lead's scoring as returned by the model. Validation coerces numeric
+    strings, clamps probability to 0-100 and treats nulls as missing, so a
+    sloppy reply gets defaults instead of leaking odd types into ranking.
+    """
+    probability: float = 0
+    analysis: str = 'No analysis'
+    matched_keywords: List[str] = []
+    decision_maker_likelihood: str = 'unknown'
+    urgency_level: str = 'unknown'
+    buying_intent_match: str = 'unknown'
+
+    @model_validator(mode='before')
+    @classmethod
+    def _drop_nulls(cls, data):
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if value is not None}
+        return data
+
+    @field_validator('probability')
+    @classmethod
+    def _clamp_probability(cls, value):
+        return min(100.0, max(0.0, value))
+
+# Statuses worth another attempt: rate limiting and transient server trouble
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_DELAY_SECONDS = 30
+MAX_ERROR_BODY_BYTES = 2048
+# Fail fast on an unreachable host; generation itself can legitimately take a while
+REQUEST_TIMEOUT = (10, 45)
+
+def _retry_delay(response, attempt: int) -> float:
+    """Honour a numeric Retry-After, else exponential backoff with jitter"""
+    retry_after = response.headers.get('Retry-After')
+    if retry_after and retry_after.isdigit():
+        return min(MAX_RETRY_DELAY_SECONDS, int(retry_after))
+    return min(MAX_RETRY_DELAY_SECONDS, 2 ** attempt + random.uniform(0, 1))
+
+# DeepSeek's published estimate: ~0.3 tokens per English character, ~0.6 per CJK
+# character. Clipping lead text by estimated tokens instead of characters keeps
+# non-Latin posts from blowing the prompt budget and gives English posts more room.
+ASCII_TOKENS_PER_CHAR = 0.3
+OTHER_TOKENS_PER_CHAR = 0.6
+LEAD_TITLE_TOKENS = 40
+LEAD_CONTENT_TOKENS = 80
+# Single-lead analysis sends the full rubric, so it gets more of the post
+SINGLE_LEAD_CONTENT_TOKENS = 1000
+
+def _clip_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to roughly max_tokens DeepSeek tokens"""
+    # No text can fit more characters than an all-ASCII one, so only that prefix is scanned
+    text = text[:int(max_tokens / ASCII_TOKENS_PER_CHAR)]
+    if text.isascii():
+        return text
+    
+    budget = float(max_tokens)
+    for i, ch in enumerate(text):
+        budget -= ASCII_TOKENS_PER_CHAR if ch < '\x80' else OTHER_TOKENS_PER_CHAR
+        if budget < 0:
+            return text[:i]
+    return text
+
+def _cache_key(data: Dict) -> str:
+    return hashlib.sha256(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+# Per-lead scores from batch analysis, keyed on the business context plus the
+# normalized post text, so reposts and crossposts that differ only in case,
+# punctuation or links are not scored (and paid for) again
+_lead_analysis_cache = TTLCache(maxsize=8192, ttl=int(os.getenv('DEEPSEEK_CACHE_TTL_SECONDS', '86400')))
+_URL_RE = re.compile(r'https?://\S+')
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+def _normalize_post_text(text: str) -> str:
+    return _NON_WORD_RE.sub(' ', _URL_RE.sub(' ', text.lower())).strip()
+
+def _compact_lead_text(text: str) -> str:
+    """Drop links and collapse whitespace; both cost tokens without telling the model much"""
+    return ' '.join(_URL_RE.sub(' ', text).split())
+
+def _lead_cache_key(context_key: str, title: str, content: str) -> str:
+    text = f"{_normalize_post_text(title)}\x1f{_normalize_post_text(content)}"
+    return hashlib.sha256(f"{context_key}\x1f{text}".encode('utf-8')).hexdigest()
+
+@lru_cache(maxsize=256)
+def _batch_context(business_name: str, business_description: str, keywords: Tuple[str, ...],
+                   buying_intent: str) -> Tuple[str, str, KeywordMatcher]:
+    """
+    Per-business pieces of batch analysis that only change when the business does:
+    the prompt prefix, the lead cache context key and the keyword matcher.
+    """
+    # Stable keyword order keeps the prompt prefix identical between calls
+    keywords_str = ", ".join(sorted(keywords))
+    
+    # Build the buying intent section
+    buying_intent_section = ""
+    if buying_intent and buying_intent.strip():
+        buying_intent_section = f"""
+QUALIFIED LEAD CRITERIA: {buying_intent}
+IMPORTANT: Score 80%+ ONLY if they match the buying intent criteria above."""
+    
+    prefix = f"""Business: {business_name} - {business_description[:100]}
+Keywords: {keywords_str}
+{buying_intent_section}
+"""
+    context_key = _cache_key([business_name, business_description[:100], keywords_str, buying_intent])
+    return prefix, context_key, KeywordMatcher(keywords)
+
 class DeepSeekAnalyzer:
     """
     AI analyzer using DeepSeek API for lead analysis and keyword extraction
@@ -16,47 +194,145 @@ class DeepSeekAnalyzer:
         self.base_url = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com/v1')
         
         if not self.api_key:
-            print("⚠️  WARNING: DEEPSEEK_API_KEY not found in environment variables")
-            print("   AI analysis features will be disabled until API key is provided")
+            logger.warning("⚠️  DEEPSEEK_API_KEY not found in environment variables - "
+                           "AI analysis features will be disabled until API key is provided")
             self.api_key = None
+        
+        # One keep-alive session per analyzer so calls skip the TCP/TLS handshake
+        self.session = create_session(pool_size=50)
+        self.max_retries = int(os.getenv('DEEPSEEK_MAX_RETRIES', '3'))
+        if self.api_key:
+            self.session.headers.update({
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json'
+            })
+        
+        # Calls are network-bound, so lead batches are analyzed side by side;
+        # the worker count caps requests in flight against DeepSeek's rate limit
+        self.max_concurrency = int(os.getenv('DEEPSEEK_MAX_CONCURRENCY', '8'))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='deepseek')
     
-    def _make_request(self, messages: List[Dict], max_tokens: int = 500) -> Optional[str]:
-        """Make a request to DeepSeek API"""
+    def _make_request(self, messages: List[Dict], max_tokens: int = 500,
+                      stop_after_json: Optional[str] = None, temperature: float = 0,
+                      json_mode: bool = False) -> Optional[str]:
+        """
+        Make a request to DeepSeek API.
+        Temperature defaults to 0 so scoring is repeatable.
+        stop_after_json ('[' or '{') streams the completion and hangs up as soon as the
+        first JSON value of that kind is complete, skipping any trailing prose.
+        json_mode asks DeepSeek for a bare JSON object (the prompt must mention JSON
+        and describe the object; top-level arrays are not allowed).
+        """
         if not self.api_key:
-            print("⚠️  DeepSeek API key not available - skipping AI analysis")
+            logger.warning("⚠️  DeepSeek API key not available - skipping AI analysis")
             return None
             
+        data = {
+            'model': 'deepseek-chat',
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+        if json_mode:
+            data['response_format'] = {'type': 'json_object'}
+        if stop_after_json:
+            data['stream'] = True
+        
         try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                'model': 'deepseek-chat',
-                'messages': messages,
-                'max_tokens': max_tokens,
-                'temperature': 0.7
-            }
-            
-            response = requests.post(
-                f'{self.base_url}/chat/completions',
-                headers=headers,
-                json=data,
-                timeout=45  # Increased timeout for batch requests
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                print(f"DeepSeek API error: {response.status_code} - {response.text}")
+            body = orjson.dumps(data)
+            for attempt in range(self.max_retries + 1):
+                if not _circuit_breaker.allow():
+                    logger.warning("DeepSeek circuit open after repeated failures - skipping request")
+                    return None
+                
+                _rate_limiter.acquire()
+                response = self.session.post(
+                    f'{self.base_url}/chat/completions',
+                    data=body,  # Content-Type is set on the session
+                    timeout=REQUEST_TIMEOUT,
+                    stream=bool(stop_after_json)
+                )
+                
+                # A 4xx is our problem, not an outage, so only 5xx counts against the service
+                if response.status_code >= 500:
+                    _circuit_breaker.record_failure()
+                else:
+                    _circuit_breaker.record_success()
+                
+                if response.status_code == 200:
+                    if stop_after_json:
+                        content = self._read_stream(response, stop_after_json)
+                    else:
+                        result = orjson.loads(response.content)
+                        content = result['choices'][0]['message']['content']
+                    return content
+                
+                # Error bodies can be large HTML pages; decode just the head, once
+                error_text = response.content[:MAX_ERROR_BODY_BYTES].decode('utf-8', 'replace')
+                
+                # A transient failure would otherwise fail the whole lead batch, so wait and retry
+                retryable = (response.status_code in RETRYABLE_STATUSES
+                             or 'rate limit' in error_text.lower())
+                if retryable and attempt < self.max_retries:
+                    delay = _retry_delay(response, attempt)
+                    logger.warning("DeepSeek API %s, retrying in %.1fs (attempt %d/%d)",
+                                   response.status_code, delay, attempt + 1, self.max_retries)
+                    time.sleep(delay)
+                    continue
+                
+                logger.error("DeepSeek API error: %s - %s", response.status_code, error_text)
                 return None
                 
+        except requests.RequestException as e:
+            # Connection errors and timeouts (including mid-stream) count as outages
+            _circuit_breaker.record_failure()
+            logger.error("DeepSeek API request failed: %s", e)
+            return None
         except Exception as e:
-            print(f"DeepSeek API request failed: {e}")
+            logger.error("DeepSeek API request failed: %s", e)
             return None
     
+    def _read_stream(self, response, stop_after_json: str) -> str:
+        """Collect a streamed (SSE) completion, closing early once the first JSON value is complete"""
+        closer = ']' if stop_after_json == '[' else '}'
+        parts = []
+        try:
+            for line in response.iter_lines():
+                if not line.startswith(b'data: '):
+                    continue
+                payload = line[6:]
+                if payload == b'[DONE]':
+                    break
+                
+                choices = orjson.loads(payload).get('choices')
+                delta = choices[0].get('delta', {}).get('content') if choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                
+                # Only a chunk containing the closing bracket can complete the value
+                if closer in delta:
+                    text = ''.join(parts)
+                    try:
+                        if _extract_json(text, stop_after_json, first_only=True) is not None:
+                            return text
+                    except json.JSONDecodeError:
+                        pass  # Not closed yet
+            return ''.join(parts)
+        finally:
+            response.close()
+    
+    def clear_cache(self):
+        """Drop all cached single-lead analyses (e.g. after changing prompts)"""
+        _response_cache.clear()
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters for the single-lead and batch per-lead caches"""
+        return {
+            'responses': _response_cache.stats(),
+            'leads': _lead_analysis_cache.stats()
+        }
+    
     def analyze_website_for_keywords(self, website_url: str, business_name: str, 
                                    business_description: str = "") -> List[Dict]:
         """
@@ -64,7 +340,7 @@ class DeepSeekAnalyzer:
         Returns list of keywords with priority and source
         """
         if not self.api_key:
-            print("⚠️  DeepSeek API key not available - returning empty keywords list")
+            logger.warning("⚠️  DeepSeek API key not available - returning empty keywords list")
             return []
         prompt = f"""
         Analyze this business and suggest 15-20 relevant keywords for finding potential customers on Reddit.
@@ -80,31 +356,28 @@ class DeepSeekAnalyzer:
         4. Competitor mentions
         5. Solution-seeking language
 
-        Return ONLY a JSON array of objects with this format:
-        [
+        Return ONLY a JSON object with this format:
+        {{"keywords": [
             {{"keyword": "keyword phrase", "priority": 1, "reason": "why this keyword is relevant"}},
             {{"keyword": "another keyword", "priority": 2, "reason": "explanation"}}
-        ]
+        ]}}
 
         Priority levels: 1=high (most likely to find customers), 2=medium, 3=low
         """
         
         messages = [
-            {"role": "system", "content": "You are an expert at identifying customer pain points and search patterns for lead generation."},
+            WEBSITE_KEYWORDS_SYSTEM_MESSAGE,
             {"role": "user", "content": prompt}
         ]
         
-        response = self._make_request(messages, max_tokens=800)
+        response = self._make_request(messages, max_tokens=800, json_mode=True)
         
         if response:
             try:
                 # Extract JSON from response
-                json_start = response.find('[')
-                json_end = response.rfind(']') + 1
-                if json_start != -1 and json_end != -1:
-                    json_str = response[json_start:json_end]
-                    keywords_data = json.loads(json_str)
-                    
+                keywords_data = _extract_json(response, '{')
+                if keywords_data is not None:
+                    keywords_data = keywords_data.get('keywords') or []
                     # Format for database
                     formatted_keywords = []
                     for kw in keywords_data:
@@ -118,8 +391,8 @@ class DeepSeekAnalyzer:
                     return formatted_keywords
                     
             except json.JSONDecodeError as e:
-                print(f"Failed to parse keywords JSON: {e}")
-                print(f"Response was: {response}")
+                logger.warning("Failed to parse keywords JSON: %s", e)
+                logger.debug("Response was: %s", response)
         
         return []
     
@@ -133,13 +406,14 @@ class DeepSeekAnalyzer:
         Returns probability score and analysis
         """
         if not self.api_key:
-            print("⚠️  DeepSeek API key not available - returning default analysis")
+            logger.warning("⚠️  DeepSeek API key not available - returning default analysis")
             return {
                 "probability": 50,
                 "analysis": "AI analysis unavailable - API key not configured",
                 "matched_keywords": business_keywords[:3] if business_keywords else []
             }
-        keywords_str = ", ".join(business_keywords)
+        # Stable keyword order keeps the prompt prefix identical between calls
+        keywords_str = ", ".join(sorted(business_keywords))
         
         # Build the buying intent section
         buying_intent_section = ""
@@ -151,8 +425,9 @@ class DeepSeekAnalyzer:
         IMPORTANT: A lead is only HIGH QUALITY (80%+) if they match the buying intent criteria above. 
         If they don't match the specific buying intent, score them lower even if they mention keywords."""
         
+        # Business context, rubric and output format first; the post goes last
         prompt = f"""
-        Analyze this Reddit post to determine if the person would be interested in our business solution.
+        Analyze the Reddit post at the end to determine if the person would be interested in our business solution.
 
         OUR BUSINESS:
         Name: {business_name}
@@ -160,10 +435,6 @@ class DeepSeekAnalyzer:
         Target Keywords: {keywords_str}
         {buying_intent_section}
 
-        REDDIT POST:
-        Title: {lead_title}
-        Content: {lead_content}
-
         Analyze:
         1. Does this person have a problem our business solves?
         2. Are they actively seeking solutions?
@@ -184,34 +455,34 @@ class DeepSeekAnalyzer:
 
         Probability: 0-100 (0=not relevant, 100=perfect match)
         Use 80%+ ONLY if they clearly match the buying intent criteria.
+
+        REDDIT POST:
+        Title: {lead_title}
+        Content: {lead_content}
         """
         
         messages = [
-            {"role": "system", "content": "You are an expert at qualifying business leads and identifying potential customers."},
+            LEAD_ANALYSIS_SYSTEM_MESSAGE,
             {"role": "user", "content": prompt}
         ]
         
-        response = self._make_request(messages, max_tokens=400)
+        cache_key = _cache_key({'messages': messages, 'max_tokens': 400})
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        response = self._make_request(messages, max_tokens=400, stop_after_json='{', json_mode=True)
         
         if response:
             try:
-                json_start = response.find('{')
-                json_end = response.rfind('}') + 1
-                if json_start != -1 and json_end != -1:
-                    json_str = response[json_start:json_end]
-                    analysis_data = json.loads(json_str)
+                analysis_data = _extract_json(response, '{', first_only=True)
+                if analysis_data is not None:
+                    analysis = LeadAnalysis.model_validate(analysis_data).model_dump()
+                    _response_cache.set(cache_key, dict(analysis))
+                    return analysis
                     
-                    return {
-                        'probability': analysis_data.get('probability', 0),
-                        'analysis': analysis_data.get('analysis', 'Analysis failed'),
-                        'matched_keywords': analysis_data.get('matched_keywords', []),
-                        'decision_maker_likelihood': analysis_data.get('decision_maker_likelihood', 'unknown'),
-                        'urgency_level': analysis_data.get('urgency_level', 'unknown'),
-                        'buying_intent_match': analysis_data.get('buying_intent_match', 'unknown')
-                    }
-                    
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse analysis JSON: {e}")
+            except (json.JSONDecodeError, ValidationError) as e:
+                logger.warning("Failed to parse analysis JSON: %s", e)
         
         return {
             'probability': 0,
@@ -230,7 +501,7 @@ class DeepSeekAnalyzer:
             return []
             
         if not self.api_key:
-            print("⚠️  DeepSeek API key not available - returning default analysis for all leads")
+            logger.warning("⚠️  DeepSeek API key not available - returning default analysis for all leads")
             return [{
                 **lead,
                 "probability": 50,
@@ -238,95 +509,139 @@ class DeepSeekAnalyzer:
                 "matched_keywords": business_keywords[:3] if business_keywords else []
             } for lead in leads]
         
-        keywords_str = ", ".join(business_keywords)
+        prompt_prefix, context_key, matcher = _batch_context(
+            business_name, business_description, tuple(business_keywords), buying_intent or ""
+        )
         
-        # Build concise batch analysis prompt
-        leads_text = ""
-        for i, lead in enumerate(leads, 1):
-            title = lead.get('title', 'No title')[:100]
-            content = lead.get('content', 'No content')[:200]
-            leads_text += f"LEAD {i}: {title} | {content}\n"
+        # Keyword hits are found locally rather than asking the model to list them
+        lead_keywords = [
+            matcher.match(f"{lead.get('title') or ''} {lead.get('content') or ''}") for lead in leads
+        ]
         
-        # Build the buying intent section
-        buying_intent_section = ""
-        if buying_intent and buying_intent.strip():
-            buying_intent_section = f"""
-QUALIFIED LEAD CRITERIA: {buying_intent}
-IMPORTANT: Score 80%+ ONLY if they match the buying intent criteria above."""
+        # Title/content exactly as the model sees them (one line per lead)
+        clipped = [
+            (_clip_tokens(_compact_lead_text(lead.get('title') or 'No title'), LEAD_TITLE_TOKENS),
+             _clip_tokens(_compact_lead_text(lead.get('content') or 'No content'), LEAD_CONTENT_TOKENS))
+            for lead in leads
+        ]
         
-        prompt = f"""Business: {business_name} - {business_description[:100]}
-Keywords: {keywords_str}
-{buying_intent_section}
-
-Analyze these {len(leads)} Reddit posts for business relevance:
-{leads_text}
+        # Leads already scored for this business context are answered from cache
+        cache_keys = [_lead_cache_key(context_key, title, content) for title, content in clipped]
+        analyses = [_lead_analysis_cache.get(key) for key in cache_keys]
+        pending = [i for i, analysis in enumerate(analyses) if analysis is None]
+        
+        batch_failed = False
+        if pending:
+            # Build concise batch analysis prompt
+            leads_text = "".join(
+                f"LEAD {n}: {clipped[i][0]} | {clipped[i][1]}\n" for n, i in enumerate(pending, 1)
+            )
+            
+            # Everything constant for the business comes before the leads
+            prompt = f"""{prompt_prefix}
+Score each of the {len(pending)} Reddit posts below for business relevance. Return a JSON object whose "leads" array has one entry per post, in order, with probability (0-100) and a brief analysis:
+{{"leads": [{{"probability": 85, "analysis": "Seeking solutions"}}, {{"probability": 20, "analysis": "Not business related"}}]}}
 
-Return JSON array with probability (0-100) and brief analysis:
-[{{"lead_id": "1", "probability": 85, "analysis": "Seeking solutions"}}, {{"lead_id": "2", "probability": 20, "analysis": "Not business related"}}]"""
+{leads_text}"""
+            
+            messages = [
+                BATCH_ANALYSIS_SYSTEM_MESSAGE,
+                {"role": "user", "content": prompt}
+            ]
+            
+            # Not cached whole: each validated lead lands in _lead_analysis_cache instead
+            response = self._make_request(messages, max_tokens=1200, stop_after_json='{', json_mode=True)
+            
+            batch_failed = True
+            if response:
+                try:
+                    # Extract JSON from response
+                    results = _extract_json(response, '{', first_only=True)
+                    if results is not None:
+                        batch_failed = False
+                        # Match analyses back to leads using position-based matching
+                        results = results.get('leads')
+                        if not isinstance(results, list):
+                            results = []
+                        for i, result in zip(pending, results):
+                            try:
+                                validated = LeadAnalysis.model_validate(result)
+                            except ValidationError as e:
+                                logger.warning("Invalid analysis for lead %d: %s", i + 1, e)
+                                analyses[i] = {'probability': 0, 'analysis': 'Invalid analysis'}
+                                continue
+                            analyses[i] = {'probability': validated.probability, 'analysis': validated.analysis}
+                            _lead_analysis_cache.set(cache_keys[i], analyses[i])
+                        
+                except json.JSONDecodeError as e:
+                    logger.warning("Failed to parse batch analysis JSON: %s", e)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Response was: %s...", response[:500])
         
-        messages = [
-            {"role": "system", "content": "You are an expert at qualifying business leads and identifying potential customers. Analyze each lead carefully and return valid JSON."},
-            {"role": "user", "content": prompt}
-        ]
+        analyzed_leads = []
+        for i, lead in enumerate(leads):
+            analysis = analyses[i]
+            if analysis is None:
+                # Fallback if no analysis found
+                analysis = {
+                    'probability': 0,
+                    'analysis': 'Batch analysis failed' if batch_failed else 'Analysis not found'
+                }
+            analyzed_leads.append({
+                **lead,
+                **analysis,
+                'ai_matched_keywords': lead_keywords[i],
+                'decision_maker_likelihood': 'unknown',
+                'urgency_level': 'unknown'
+            })
         
-        response = self._make_request(messages, max_tokens=1200)
+        return analyzed_leads
+    
+    def _analyze_single_lead(self, leads: List[Dict], business_keywords: List[str], business_name: str,
+                             business_description: str = "", buying_intent: str = "") -> List[Dict]:
+        """Batch-shaped wrapper around analyze_lead_for_business for a one-lead batch"""
+        lead = leads[0]
+        analysis = self.analyze_lead_for_business(
+            lead.get('title') or '',
+            _clip_tokens(lead.get('content') or '', SINGLE_LEAD_CONTENT_TOKENS),
+            business_keywords, business_name, business_description, buying_intent
+        )
+        # Keep the lead's own keyword matches; the model's go alongside, as in batch results
+        analysis['ai_matched_keywords'] = analysis.pop('matched_keywords', [])
+        return [{**lead, **analysis}]
+    
+    def analyze_lead_batches_for_business(self, leads: List[Dict], business_keywords: List[str],
+                                          business_name: str, business_description: str = "",
+                                          buying_intent: str = "", batch_size: int = 5) -> Iterator[Tuple[int, Optional[List[Dict]]]]:
+        """
+        Split leads into batches and analyze them concurrently.
+        Yields (batch_number, analyzed_leads) as each batch finishes; analyzed_leads
+        is None if that batch raised.
+        batch_size=1 scores every lead with its own full analyze_lead_for_business
+        call instead of the condensed multi-lead prompt.
+        """
+        analyze = self._analyze_single_lead if batch_size == 1 else self.batch_analyze_leads_for_business
+        batches = [leads[i:i + batch_size] for i in range(0, len(leads), batch_size)]
+        futures = {
+            self._executor.submit(analyze, batch, business_keywords,
+                                  business_name, business_description, buying_intent): batch_num
+            for batch_num, batch in enumerate(batches, 1)
+        }
         
-        if response:
+        for future in as_completed(futures):
+            batch_num = futures[future]
             try:
-                # Extract JSON from response
-                json_start = response.find('[')
-                json_end = response.rfind(']') + 1
-                if json_start != -1 and json_end != -1:
-                    json_str = response[json_start:json_end]
-                    analyses = json.loads(json_str)
-                    
-                    # Match analyses back to leads using position-based matching
-                    analyzed_leads = []
-                    for i, lead in enumerate(leads):
-                        # Use position-based matching (simpler and more reliable)
-                        if i < len(analyses):
-                            analysis = analyses[i]
-                            analyzed_leads.append({
-                                **lead,
-                                'probability': analysis.get('probability', 0),
-                                'analysis': analysis.get('analysis', 'No analysis'),
-                                'ai_matched_keywords': [],  # Simplified for batch processing
-                                'decision_maker_likelihood': 'unknown',
-                                'urgency_level': 'unknown'
-                            })
-                        else:
-                            # Fallback if no analysis found
-                            analyzed_leads.append({
-                                **lead,
-                                'probability': 0,
-                                'analysis': 'Analysis not found',
-                                'ai_matched_keywords': [],
-                                'decision_maker_likelihood': 'unknown',
-                                'urgency_level': 'unknown'
-                            })
-                    
-                    return analyzed_leads
-                    
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse batch analysis JSON: {e}")
-                print(f"Response was: {response[:500]}...")
-        
-        # Fallback: return leads with no analysis
-        return [{
-            **lead,
-            'probability': 0,
-            'analysis': 'Batch analysis failed',
-            'ai_matched_keywords': [],
-            'decision_maker_likelihood': 'unknown',
-            'urgency_level': 'unknown'
-        } for lead in leads]
+                yield batch_num, future.result()
+            except Exception as e:
+                logger.error("Batch %d analysis failed: %s", batch_num, e)
+                yield batch_num, None
     
     def comprehensive_business_setup(self, website_url: str, business_name: str) -> Dict:
         """
         Comprehensive AI analysis to set up entire business profile
         """
         if not self.api_key:
-            print("⚠️  DeepSeek API key not available - returning default setup")
+            logger.warning("⚠️  DeepSeek API key not available - returning default setup")
             return {
                 "business_info": {
                     "description": "AI analysis unavailable - API key not configured",
@@ -386,23 +701,20 @@ Return JSON array with probability (0-100) and brief analysis:
         """
         
         messages = [
-            {"role": "system", "content": "You are an expert business analyst and marketing strategist. Analyze websites thoroughly and create comprehensive lead generation setups."},
+            WEBSITE_SETUP_SYSTEM_MESSAGE,
             {"role": "user", "content": prompt}
         ]
         
-        response = self._make_request(messages, max_tokens=1500)
+        response = self._make_request(messages, max_tokens=1500, temperature=0.7, json_mode=True)
         
         if response:
             try:
-                json_start = response.find('{')
-                json_end = response.rfind('}') + 1
-                if json_start != -1 and json_end != -1:
-                    json_str = response[json_start:json_end]
-                    setup_data = json.loads(json_str)
+                setup_data = _extract_json(response, '{')
+                if setup_data is not None:
                     return setup_data
                     
             except json.JSONDecodeError as e:
-                print(f"Failed to parse comprehensive setup JSON: {e}")
+                logger.warning("Failed to parse comprehensive setup JSON: %s", e)
         
         # Return fallback setup
         return {
@@ -431,7 +743,7 @@ Return JSON array with probability (0-100) and brief analysis:
         AI analysis based on text description only (no website)
         """
         if not self.api_key:
-            print("⚠️  DeepSeek API key not available - returning default setup")
+            logger.warning("⚠️  DeepSeek API key not available - returning default setup")
             return {
                 "business_info": {
                     "description": "AI analysis unavailable - API key not configured",
@@ -480,23 +792,20 @@ Return JSON array with probability (0-100) and brief analysis:
         """
         
         messages = [
-            {"role": "system", "content": "You are an expert business analyst. Create comprehensive lead generation setups based on business descriptions."},
+            DESCRIPTION_SETUP_SYSTEM_MESSAGE,
             {"role": "user", "content": prompt}
         ]
         
-        response = self._make_request(messages, max_tokens=1200)
+        response = self._make_request(messages, max_tokens=1200, temperature=0.7, json_mode=True)
         
         if response:
             try:
-                json_start = response.find('{')
-                json_end = response.rfind('}') + 1
-                if json_start != -1 and json_end != -1:
-                    json_str = response[json_start:json_end]
-                    setup_data = json.loads(json_str)
+                setup_data = _extract_json(response, '{')
+                if setup_data is not None:
                     return setup_data
                     
             except json.JSONDecodeError as e:
-                print(f"Failed to parse text-based setup JSON: {e}")
+                logger.warning("Failed to parse text-based setup JSON: %s", e)
         
         # Return fallback setup
         return {
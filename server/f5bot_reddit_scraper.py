@@ -4,20 +4,53 @@ F5Bot Reddit scraper integrated with the lead generation database system.
 Based on F5Bot techniques from https://intoli.com/blog/f5bot/
 """
 
-import requests
+import html
 import json
+import orjson
 import time
 import random
+import re
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import urllib.parse
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
 from dotenv import load_dotenv
+from lxml import etree
+from http_client import create_session
+from keyword_matcher import matcher_for, strip_tags
 
 load_dotenv()
 
-@dataclass
+# Compiled once: Reddit serves Atom, other feeds RSS 2.0, so each lookup covers both
+_FEED_NS = {'atom': 'http://www.w3.org/2005/Atom'}
+
+def _feed_xpath(expression: str) -> etree.XPath:
+    return etree.XPath(expression, namespaces=_FEED_NS, smart_strings=False)
+
+_ENTRIES = _feed_xpath('//atom:entry | //item')
+_TITLE = _feed_xpath('string(atom:title | title)')
+_CONTENT = _feed_xpath('string(atom:content | description)')
+_LINK = _feed_xpath('string(atom:link/@href | link)')
+_PUBLISHED = _feed_xpath('string(atom:published)')
+_UPDATED = _feed_xpath('string(atom:updated)')
+
+# RSS results are mostly a subset of the JSON API's, so a batch only falls back to
+# RSS when the JSON search failed or returned less than this share of its quota
+RSS_FALLBACK_COVERAGE = 0.8
+
+# Characters each keyword adds to a search query besides itself: '"keyword" OR '
+QUERY_TERM_OVERHEAD = len('"" OR ')
+
+@lru_cache(maxsize=1024)
+def _word_boundary_re(keyword_lower: str) -> re.Pattern:
+    """Compiled whole-word pattern for a keyword, built once per keyword"""
+    return re.compile(r'\b' + re.escape(keyword_lower) + r'\b')
+
+@dataclass(slots=True)
 class RedditPost:
     """Data structure for Reddit posts."""
     id: str
@@ -31,6 +64,15 @@ class RedditPost:
     created_utc: float
     permalink: str
     matched_keywords: List[str]
+    # Lowercased once while matching and reused by relevance scoring
+    title_lower: Optional[str] = field(default=None, repr=False, compare=False)
+    content_lower: Optional[str] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.title_lower is None:
+            self.title_lower = self.title.lower()
+        if self.content_lower is None:
+            self.content_lower = self.content.lower()
 
 class F5BotRedditScraper:
     """
@@ -38,7 +80,7 @@ class F5BotRedditScraper:
     """
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = create_session()
         
         # Rotate user agents to avoid detection (F5Bot technique)
         self.user_agents = [
@@ -55,6 +97,13 @@ class F5BotRedditScraper:
         self.min_delay = 3
         self.max_delay = 7
         self.request_count = 0
+        self._count_lock = threading.Lock()
+        # Every search (JSON API and RSS fallback) runs on this pool, so its size caps
+        # the Reddit requests in flight
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('REDDIT_SEARCH_WORKERS', '2')),
+            thread_name_prefix='f5bot'
+        )
         
         # Keyword batching parameters for optimal performance
         self.max_keywords_per_batch = 12  # Optimal batch size for Reddit API
@@ -74,22 +123,24 @@ class F5BotRedditScraper:
             'Cache-Control': 'max-age=0'
         })
         
-    def _rotate_user_agent(self):
-        """Rotate user agent for each request (F5Bot technique)."""
-        user_agent = random.choice(self.user_agents)
-        self.session.headers.update({'User-Agent': user_agent})
+    def _rotate_user_agent(self) -> Dict[str, str]:
+        """Pick a user agent for one request (F5Bot technique)."""
+        # Returned per request rather than set on the session, which is shared across threads
+        return {'User-Agent': random.choice(self.user_agents)}
         
     def _smart_delay(self):
         """Implement smart delays to avoid rate limiting (F5Bot approach)."""
-        self.request_count += 1
+        with self._count_lock:
+            self.request_count += 1
+            request_count = self.request_count
         
         # Base delay with jitter
         base_delay = random.uniform(self.min_delay, self.max_delay)
         
         # Increase delay after multiple requests
-        if self.request_count % 5 == 0:
+        if request_count % 5 == 0:
             base_delay *= 1.5
-            print(f"  🕐 Increased delay after {self.request_count} requests")
+            print(f"  🕐 Increased delay after {request_count} requests")
         
         time.sleep(base_delay)
         
@@ -117,39 +168,51 @@ class F5BotRedditScraper:
         
         all_posts = []
         
-        # F5Bot uses multiple search strategies
-        search_methods = [
-            self._search_via_json_api,
-            self._search_via_rss_feeds
-        ]
+        per_batch_limit = limit // len(keyword_batches)
         
-        for batch_num, keyword_batch in enumerate(keyword_batches, 1):
-            print(f"\n🔄 Processing batch {batch_num}/{len(keyword_batches)} ({len(keyword_batch)} keywords)")
-            
-            batch_posts = []
+        # Queue the JSON API search for every batch up front. Each search sleeps after
+        # its request, so the pool keeps a fixed number in flight and no batch waits
+        # for another. RSS (F5Bot's fallback method) is queued per batch only when the
+        # JSON search comes back failed or sparse.
+        futures = {
+            self._executor.submit(self._search_via_json_api, keyword_batch, per_batch_limit, time_filter):
+                (batch_num, keyword_batch, self._search_via_json_api)
+            for batch_num, keyword_batch in enumerate(keyword_batches, 1)
+        }
+        
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
             
-            for i, search_method in enumerate(search_methods):
+            for future in done:
+                batch_num, keyword_batch, search_method = futures.pop(future)
+                method_posts = []
                 try:
-                    print(f"  Method {i+1}/{len(search_methods)}: {search_method.__name__}")
+                    print(f"  Batch {batch_num}/{len(keyword_batches)}: {search_method.__name__}")
                     
-                    method_posts = search_method(keyword_batch, limit // len(keyword_batches), time_filter)
+                    method_posts = future.result() or []
                     
                     if method_posts:
-                        batch_posts.extend(method_posts)
+                        all_posts.extend(method_posts)
                         print(f"    ✅ Found {len(method_posts)} posts")
                     else:
                         print(f"    ℹ️  No results from this method")
                         
                 except Exception as e:
                     print(f"    ❌ Method failed: {str(e)}")
-                    continue
-            
-            all_posts.extend(batch_posts)
-            print(f"  📊 Batch {batch_num} total: {len(batch_posts)} posts")
+                
+                if (search_method == self._search_via_json_api
+                        and len(method_posts) < per_batch_limit * RSS_FALLBACK_COVERAGE):
+                    print(f"    ↪️  Falling back to RSS for batch {batch_num}")
+                    fallback = self._executor.submit(
+                        self._search_via_rss_feeds, keyword_batch, per_batch_limit, time_filter
+                    )
+                    futures[fallback] = (batch_num, keyword_batch, self._search_via_rss_feeds)
             
-            # Stop if we have enough results
+            # Stop if we have enough results; searches not yet started are dropped
             if len(all_posts) >= limit:
                 print(f"  🎯 Reached target limit, stopping early")
+                for pending in futures:
+                    pending.cancel()
                 break
         
         # Remove duplicates and sort by relevance
@@ -165,7 +228,7 @@ class F5BotRedditScraper:
         
         try:
             # Rotate user agent
-            self._rotate_user_agent()
+            headers = self._rotate_user_agent()
             
             # Build combined search query using OR operator
             # Reddit supports: (keyword1 OR keyword2 OR keyword3)
@@ -183,24 +246,20 @@ class F5BotRedditScraper:
             
             print(f"    📡 Searching {len(keywords)} keywords via JSON API")
             
-            response = self.session.get(url, params=params, timeout=15)
+            response = self.session.get(url, params=params, headers=headers, timeout=15)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 
                 if 'data' in data and 'children' in data['data']:
+                    matcher = matcher_for(tuple(keywords))
                     for item in data['data']['children']:
                         post_data = item['data']
                         
                         # Determine which keywords match this post
-                        title = post_data.get('title', '').lower()
-                        content = post_data.get('selftext', '').lower()
-                        full_text = f"{title} {content}"
-                        
-                        matched_keywords = []
-                        for keyword in keywords:
-                            if keyword.lower() in full_text:
-                                matched_keywords.append(keyword)
+                        title_lower = post_data.get('title', '').lower()
+                        content_lower = post_data.get('selftext', '').lower()
+                        matched_keywords = matcher.match_lower(f"{title_lower} {content_lower}")
                         
                         # Only include posts that actually match our keywords
                         if matched_keywords:
@@ -215,7 +274,9 @@ class F5BotRedditScraper:
                                 num_comments=post_data.get('num_comments', 0),
                                 created_utc=post_data.get('created_utc', 0),
                                 permalink=f"https://reddit.com{post_data.get('permalink', '')}",
-                                matched_keywords=matched_keywords
+                                matched_keywords=matched_keywords,
+                                title_lower=title_lower,
+                                content_lower=content_lower
                             )
                             
                             posts.append(post)
@@ -242,7 +303,7 @@ class F5BotRedditScraper:
         
         try:
             # Rotate user agent
-            self._rotate_user_agent()
+            headers = self._rotate_user_agent()
             
             # Build combined RSS search query
             search_query = "(" + " OR ".join([f'"{kw}"' for kw in keywords]) + ")"
@@ -258,11 +319,11 @@ class F5BotRedditScraper:
             
             print(f"    📡 Searching {len(keywords)} keywords via RSS")
             
-            response = self.session.get(url, params=params, timeout=15)
+            response = self.session.get(url, params=params, headers=headers, timeout=15)
             
             if response.status_code == 200:
-                # Parse RSS/Atom feed
-                posts = self._parse_rss_response(response.text, keywords)
+                # Parse RSS/Atom feed from the raw bytes; libxml2 handles the decoding
+                posts = self._parse_rss_response(response.content, keywords)
                 
             elif response.status_code == 429:
                 print(f"    ⚠️  RSS Rate limited (429)")
@@ -278,55 +339,42 @@ class F5BotRedditScraper:
         
         return posts
     
-    def _parse_rss_response(self, rss_content: str, keywords: List[str]) -> List[RedditPost]:
+    def _parse_rss_response(self, rss_content: bytes, keywords: List[str]) -> List[RedditPost]:
         """Parse RSS/Atom response into RedditPost objects."""
         posts = []
         
         try:
-            import xml.etree.ElementTree as ET
-            import html
-            import re
-            
-            root = ET.fromstring(rss_content)
+            parser = etree.XMLParser(resolve_entities=False, no_network=True)
+            root = etree.fromstring(rss_content, parser)
+            matcher = matcher_for(tuple(keywords))
             
             # Handle both RSS and Atom formats
-            entries = root.findall('.//{http://www.w3.org/2005/Atom}entry')
-            if not entries:
-                entries = root.findall('.//item')
-            
-            for entry in entries:
+            for entry in _ENTRIES(root):
                 try:
-                    # Extract title
-                    title_elem = entry.find('{http://www.w3.org/2005/Atom}title')
-                    if title_elem is None:
-                        title_elem = entry.find('title')
-                    title = html.unescape(title_elem.text) if title_elem is not None else ""
-                    
-                    # Extract content
-                    content_elem = entry.find('{http://www.w3.org/2005/Atom}content')
-                    if content_elem is None:
-                        content_elem = entry.find('description')
-                    content = html.unescape(content_elem.text) if content_elem is not None else ""
+                    title = html.unescape(_TITLE(entry))
+                    content = html.unescape(_CONTENT(entry))
                     
                     # Clean HTML tags
-                    content = re.sub(r'<[^>]+>', '', content)
+                    content = strip_tags(content)
                     
                     # Determine which keywords match this post
-                    full_text = f"{title} {content}".lower()
-                    matched_keywords = []
-                    for keyword in keywords:
-                        if keyword.lower() in full_text:
-                            matched_keywords.append(keyword)
+                    title_lower = title.lower()
+                    content_lower = content.lower()
+                    matched_keywords = matcher.match_lower(f"{title_lower} {content_lower}")
                     
                     # Only include posts that match our keywords
                     if matched_keywords:
+                        # Atom timestamps are ISO-8601 (e.g. 2024-01-31T09:15:00+00:00)
+                        created_utc = time.time()  # Approximate when the feed has none
+                        date_text = _PUBLISHED(entry) or _UPDATED(entry)
+                        if date_text:
+                            try:
+                                created_utc = datetime.fromisoformat(date_text).timestamp()
+                            except ValueError:
+                                pass
+                        
                         # Extract URL
-                        link_elem = entry.find('{http://www.w3.org/2005/Atom}link')
-                        if link_elem is not None:
-                            url = link_elem.get('href', '')
-                        else:
-                            link_elem = entry.find('link')
-                            url = link_elem.text if link_elem is not None else ""
+                        url = _LINK(entry).strip()
                         
                         # Extract subreddit from URL
                         subreddit = ""
@@ -353,9 +401,11 @@ class F5BotRedditScraper:
                             url=url,
                             score=0,  # RSS doesn't include scores
                             num_comments=0,
-                            created_utc=time.time(),  # Approximate
+                            created_utc=created_utc,
                             permalink=url,
-                            matched_keywords=matched_keywords
+                            matched_keywords=matched_keywords,
+                            title_lower=title_lower,
+                            content_lower=content_lower
                         )
                         
                         posts.append(post)
@@ -399,8 +449,8 @@ class F5BotRedditScraper:
             """Calculate relevance score for a post."""
             score = 0.0
             
-            title_lower = post.title.lower()
-            content_lower = post.content.lower()
+            title_lower = post.title_lower
+            content_lower = post.content_lower
             
             # Score based on matched keywords
             for keyword in post.matched_keywords:
@@ -418,10 +468,10 @@ class F5BotRedditScraper:
                     score += 5.0
                 
                 # Word boundary matches are better than partial matches
-                import re
-                if re.search(r'\b' + re.escape(keyword_lower) + r'\b', title_lower):
+                word_re = _word_boundary_re(keyword_lower)
+                if word_re.search(title_lower):
                     score += 3.0
-                if re.search(r'\b' + re.escape(keyword_lower) + r'\b', content_lower):
+                if word_re.search(content_lower):
                     score += 2.0
             
             # Boost score based on number of matched keywords
@@ -459,7 +509,7 @@ class F5BotRedditScraper:
         
         for keyword in keywords:
             # Estimate query length for this keyword (with quotes and OR operator)
-            keyword_length = len(f'"{keyword}" OR ')
+            keyword_length = len(keyword) + QUERY_TERM_OVERHEAD
             
             # Check if adding this keyword would exceed limits
             would_exceed_count = len(current_batch) >= self.max_keywords_per_batch
@@ -482,6 +532,15 @@ class F5BotRedditScraper:
         return batches
 
 
+_scraper = None
+
+def _get_scraper() -> F5BotRedditScraper:
+    """Reuse one scraper between runs so its session keeps Reddit connections alive"""
+    global _scraper
+    if _scraper is None:
+        _scraper = F5BotRedditScraper()
+    return _scraper
+
 # Function to maintain compatibility with existing background service
 def search_reddit_leads_efficient(keywords: List[str], 
                                  subreddits: List[str] = None, 
@@ -521,7 +580,7 @@ def search_reddit_leads_efficient(keywords: List[str],
     print(f"🔍 Scraping with {len(unique_keywords)} unique keywords")
     
     try:
-        scraper = F5BotRedditScraper()
+        scraper = _get_scraper()
         
         # Convert days_back to time_filter
         if days_back <= 1:
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def create_session(pool_size: int = 32, retries: int = 2, backoff_factor: float = 0.2) -> requests.Session:
+    """
+    requests.Session with a keep-alive pool sized for our outbound fan-out.
+    Connection-level failures are retried with backoff; HTTP error statuses
+    are left to the caller.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=()),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    return session
+
+# Shared by the API-side callers (token verification etc.) so repeat calls
+# reuse the TLS connection instead of handshaking every time
+SESSION = create_session()
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows bursts of up to `burst` calls, then paces
+    callers to `rate` per second. acquire() reserves a token and sleeps until
+    it is due, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Thread-safe consecutive-failure breaker. After `fail_max` failures in a row
+    the circuit opens and allow() refuses calls for `reset_timeout` seconds;
+    then a single trial call is let through, and its outcome closes or reopens it.
+    Every allowed call must report back via record_success() or record_failure().
+    """
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
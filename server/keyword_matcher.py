@@ -0,0 +1,55 @@
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+import ahocorasick
+
+# Reddit RSS content arrives as HTML; strip tags before matching
+TAG_RE = re.compile(r'<[^>]+>')
+
+def strip_tags(content: str) -> str:
+    return TAG_RE.sub('', content)
+
+class KeywordMatcher:
+    """
+    Case-insensitive substring matcher for a fixed keyword list.
+    Builds one Aho-Corasick automaton so each text is scanned once,
+    however many keywords there are.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self._automaton = ahocorasick.Automaton()
+
+        # Several keywords can share a lowercase form; keep all their positions
+        positions = {}
+        for index, keyword in enumerate(self.keywords):
+            positions.setdefault(keyword.lower(), []).append(index)
+
+        for word, indexes in positions.items():
+            if word:
+                self._automaton.add_word(word, indexes)
+
+        self._empty = not positions.keys() - {''}
+        if not self._empty:
+            self._automaton.make_automaton()
+
+    def match(self, text: str) -> List[str]:
+        """Keywords found in text, in the order they were given"""
+        return self.match_lower(text.lower())
+
+    def match_lower(self, text_lower: str) -> List[str]:
+        """match() for text the caller has already lowercased"""
+        if self._empty or not text_lower:
+            return []
+
+        found = set()
+        for _, indexes in self._automaton.iter(text_lower):
+            found.update(indexes)
+
+        return [self.keywords[index] for index in sorted(found)]
+
+@lru_cache(maxsize=128)
+def matcher_for(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    """Shared matcher per keyword set, so repeat searches skip rebuilding the automaton"""
+    return KeywordMatcher(keywords)
@@ -4,6 +4,7 @@ import requests
 from typing import Optional, Dict
 from datetime import datetime
 from dotenv import load_dotenv
+from http_client import SESSION
 
 load_dotenv()
 
@@ -75,7 +76,7 @@ class SupabaseAuth:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(
+            response = SESSION.get(
                 f'{self.supabase_url}/auth/v1/user',
                 headers=headers,
                 timeout=5  # Reduced timeout
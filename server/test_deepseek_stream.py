@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for streamed DeepSeek replies that arrive in chunks
+"""
+import sys
+import os
+sys.path.append('.')
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test-key')
+
+import orjson
+from deepseek_analyzer import DeepSeekAnalyzer
+
+BATCH_REPLY = '{"leads": [{"probability": 85, "analysis": "a"}, {"probability": 20, "analysis": "b"}]}'
+
+class FakeStreamResponse:
+    """Stands in for a streamed requests.Response, sending the reply a few characters per SSE event"""
+    status_code = 200
+
+    def __init__(self, text, chunk_size=7):
+        self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.closed = False
+
+    def iter_lines(self):
+        for chunk in self.chunks:
+            yield b'data: ' + orjson.dumps({'choices': [{'delta': {'content': chunk}}]})
+        yield b'data: [DONE]'
+
+    def close(self):
+        self.closed = True
+
+def test_read_stream_waits_for_outer_object():
+    analyzer = DeepSeekAnalyzer()
+    response = FakeStreamResponse(BATCH_REPLY)
+
+    text = analyzer._read_stream(response, '{')
+
+    assert text == BATCH_REPLY, text
+    assert response.closed
+
+def test_batch_analysis_of_chunked_stream():
+    analyzer = DeepSeekAnalyzer()
+    analyzer.session.post = lambda *args, **kwargs: FakeStreamResponse(BATCH_REPLY)
+    leads = [
+        {'title': 'Looking for a CRM for my startup', 'content': 'Budget is ready'},
+        {'title': 'Weekend photos', 'content': 'Nothing to buy here'}
+    ]
+
+    analyzed = analyzer.batch_analyze_leads_for_business(leads, ['crm'], 'Test Business', 'CRM software')
+
+    assert [lead['probability'] for lead in analyzed] == [85, 20], analyzed
+    assert [lead['analysis'] for lead in analyzed] == ['a', 'b'], analyzed
+
+def test_cut_off_lead_reply_is_not_cached():
+    analyzer = DeepSeekAnalyzer()
+    replies = ['{"probability": 90, "analysis": "Needs a CR', '{"probability": 90, "analysis": "Needs a CRM"}']
+    analyzer.session.post = lambda *args, **kwargs: FakeStreamResponse(replies.pop(0))
+
+    first = analyzer.analyze_lead_for_business('Need a CRM', 'Any tips?', ['crm'], 'Cache Test Business')
+    second = analyzer.analyze_lead_for_business('Need a CRM', 'Any tips?', ['crm'], 'Cache Test Business')
+
+    assert first['analysis'] == 'AI analysis failed', first
+    assert second['probability'] == 90 and not replies, second
+
+if __name__ == "__main__":
+    test_read_stream_waits_for_outer_object()
+    test_batch_analysis_of_chunked_stream()
+    test_cut_off_lead_reply_is_not_cached()
+    print("✅ Chunked streams parsed and cached correctly")